@@ -1,13 +1,26 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import base64
+import numpy as np
+from flights import data, figures, profiling, queries
 
 st.set_page_config(
     page_title="Home",
     page_icon='✈️'
     )
 
+# timing each section of the page when profiling is turned on (with ?profile=1 in the url or FLIGHTS_PROFILE=1).
+profile = profiling.start('Home')
+
+# getting the precomputed aggregates of the flight data which are built once and shared by all the pages, every chart below is answered from these.
+cube = data.load_cube("data/flights_sample_3m.csv")
+# or those of the last hour, day or month of the live flight stream instead, when it's turned on in the sidebar.
+cube = data.live(cube)
+# the months the data covers (as the number of months since 1970), which grow as new months are appended to the data.
+months = cube.values('Month')
+month_names = data.month_names(months)
+profile.mark('load')
+
 # reading the gif file as binary data and then encoding it as a base64, and storing the result as a string.
 with open("data/airport.gif", "rb") as f:
     gif_data = f.read()
@@ -18,7 +31,7 @@ st.markdown(
     f"""
     <div style="display: flex; justify-content: center; align-items: center;">
         <img src="data:image/gif;base64,{gif}" alt="gif" width="100">
-        <h1 style="margin-left: 10px;">US Flight Patterns From January to August 2023</h1>
+        <h1 style="margin-left: 10px;">US Flight Patterns From {data.period(months)}</h1>
     </div>
     """, 
     unsafe_allow_html=True
@@ -27,57 +40,39 @@ st.markdown(
 # making a gray horizontal line under my title.
 st.markdown("<hr style='border: 1px solid #f0f0f0;'>", unsafe_allow_html=True)
 
-st.write("Welcome to my Stremlit App! The goal of this app is to help you navigate and understand the overall flight patterns, including those related to departure and arrival cancellations and delays from January to August of 2023. There are two additional pages which can be accessed through the side bar on the left.")
-
-
-# added cache to ensure that the data doesn't have to be reloaded every time the file runs.
-@st.cache_data
-def load_data(csv):
-    return pd.read_csv(csv)
-
-# reading the csv as a pandas daatframe.
-flights_data = load_data("data/flights_sample_3m.csv")
-
-# converting 'FL_DATE' column to datetime.
-flights_data['FL_DATE'] = pd.to_datetime(flights_data['FL_DATE'])
+st.write(f"Welcome to my Stremlit App! The goal of this app is to help you navigate and understand the overall flight patterns, including those related to departure and arrival cancellations and delays from {data.period(months)}. The Departures, Arrivals, Routes and Delay Risk pages can be accessed through the side bar on the left.")
 
 
 
 # LINE CHART
 st.header("Flight Trends")
-st.write("The line chart below shows the changes in the total number of flights from aggregated on month specifically from January to August of 2023.")
+st.write(f"The line chart below shows the changes in the total number of flights from aggregated on month specifically from {data.period(months)}.")
 st.write("Choose how you want to analyze the monthly trends by selecting either Overall Flight Trends (which shows the flight trends over the year aggregated by months) or Flight Trends by Specific Airlines (which allows you to choose multiple airlines and shows the changes in the total number of flights aggregated by month).")
 
-# extracting month from the 'FL_DATE' column.
-flights_data['Month'] = flights_data['FL_DATE'].dt.month
-# maping months to the numerical values and then ordering it based on the months.
-months = {1: 'January', 2: 'February', 3: 'March', 4: 'April', 5: 'May', 6: 'June', 7: 'July', 8: 'August'}
-flights_data['Month'] = flights_data['Month'].map(months)
-flights_data['Month'] = pd.Categorical(flights_data['Month'], categories=months.values(), ordered=True)
-
 # radio buttons to select overall or specific airlines.
 choice = st.radio("Select Method of Analysis:", ('Overall Flight Trends', 'Flight Trends by Specific Airline(s)'))
 
-# plotting based on the selected option.
-if choice == 'Overall Flight Trends':
+# each chart is built by a function of the data and the widgets it depends on, and is only rebuilt when one of them changes (otherwise the
+# finished figure is reused from the figure cache).
+@figures.chart('Home: flight trends')
+def flight_trends_chart(cube):
     # resampling data to get monthly total flights.
-    monthly_flights = flights_data.groupby('Month')['FL_NUMBER'].count().reset_index(name='TotalFlights')
+    monthly_flights = cube.query('Flights', by=['Month']).reset_index(name='TotalFlights')
+    monthly_flights['Month'] = monthly_flights['Month'].map(data.month_names(cube.values('Month')))
 
     # plotting and adding tooltip.
     fig = px.line(monthly_flights, x='Month', y='TotalFlights', markers=True,
                   labels={'Month': 'Month', 'TotalFlights': 'Total Flights'},
                   title='Total Number of Flights by Month')
     fig.update_traces(hovertemplate='<b>Month:</b> %{x}<br><b>Total Flights:</b> %{y:,.0f}')
-    st.plotly_chart(fig)
-else: 
-    # dropdown box which allows my user to select multiple airlines.
-    selected_airlines = st.multiselect('Select Airlines', flights_data['AIRLINE'].unique())
+    return fig
 
-    # filtering based on selected airlines. 
-    filtered_data = flights_data[flights_data['AIRLINE'].isin(selected_airlines)]
 
-    # resampling data to get monthly total flights.
-    monthly_flights = filtered_data.groupby(['AIRLINE', 'Month'])['FL_NUMBER'].count().reset_index(name='TotalFlights')
+@figures.chart('Home: flight trends by airline')
+def airline_trends_chart(cube, selected_airlines):
+    # resampling data to get monthly total flights for the selected airlines.
+    monthly_flights = cube.query('Flights', by=['AIRLINE', 'Month'], AIRLINE=selected_airlines).reset_index(name='TotalFlights')
+    monthly_flights['Month'] = monthly_flights['Month'].map(data.month_names(cube.values('Month')))
 
     # plotting and adding tooltip.
     fig1 = px.line(monthly_flights, x='Month', y='TotalFlights', color='AIRLINE', markers=True,
@@ -85,29 +80,48 @@ else:
                 title='Total Number of Flights by Month For Selected Airlines',
                 hover_name='AIRLINE')
     fig1.update_traces(hovertemplate='<b>Month:</b> %{x}<br><b>Total Flights:</b> %{y:,.0f}')
+    return fig1
+
+
+# plotting based on the selected option.
+if choice == 'Overall Flight Trends':
+    fig = flight_trends_chart(cube)
+    profile.mark('flight trends: figure')
+    st.plotly_chart(fig)
+    profile.mark('flight trends: render')
+else: 
+    # dropdown box which allows my user to select multiple airlines.
+    selected_airlines = st.multiselect('Select Airlines', cube.values('AIRLINE'))
+
+    fig1 = airline_trends_chart(cube, selected_airlines)
+    profile.mark('flight trends: figure')
     st.plotly_chart(fig1)
+    profile.mark('flight trends: render')
 
 
 
 # CREATING A FILTER THEN FILTERING THE DATA FOR THE PLOTS BASED ON IT
 st.header("Filter Flight Data by Month(s)")
-selected_month = st.selectbox("Select a Month", ['All','January', 'February', 'March', 'April', 'May', 'June', 'July', 'August'])
-st.markdown("<b>*Note: </b> This selection will be used to filter all the charts below.",unsafe_allow_html=True)
+selected_month = st.selectbox("Select a Month", ['All', *month_names.values(), 'Custom Date Range'])
 
-# filtering the data based on the selected month where if its all, then I set it back to the original data which includes all the months, and if a specific month was selected, the data is filtered accordingly for each plot.
+# setting the range of dates used for each plot where if its all, then the range includes all of the data, if a specific month was selected, the range is that month,
+# and otherwise it is the range of dates picked by the user (e.g. a single week).
+first_day, last_day = cube.dates()
 if selected_month == 'All':
-    selected_month_filtered = flights_data
-    top_airports = flights_data
-    top_airlines = flights_data
-    filtered_status = flights_data
-
+    date_range = (first_day, last_day)
+elif selected_month == 'Custom Date Range':
+    picked_dates = st.date_input("Select a Date Range", (first_day.item(), last_day.item()), min_value=first_day.item(), max_value=last_day.item())
+    # while only the start of the range has been picked, the range is just that day.
+    date_range = (np.datetime64(picked_dates[0], 'D'), np.datetime64(picked_dates[-1], 'D')) if picked_dates else (first_day, last_day)
+    selected_month = f"{date_range[0].item():%B %d, %Y} to {date_range[1].item():%B %d, %Y}"
 else:
-    selected_month_index = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August'].index(selected_month) + 1
-    selected_month_filtered = flights_data[flights_data['FL_DATE'].dt.month == selected_month_index]
-    filtered_status = selected_month_filtered
-    top_airlines = selected_month_filtered
-    filtered_top_airlines =selected_month_filtered 
-    top_airports = flights_data[flights_data['FL_DATE'].dt.month == selected_month_index]
+    selected_month_index = list(month_names.values()).index(selected_month)
+    date_range = data.month_dates(months[selected_month_index])
+st.markdown("<b>*Note: </b> This selection will be used to filter all the charts below.",unsafe_allow_html=True)
+
+# the flights in the range of dates, which every chart below is answered from (adding up the counts of every day takes the same time for any range).
+in_range = cube.between(*date_range)
+profile.mark('date range')
 
 
 
@@ -117,19 +131,27 @@ if selected_month == "All":
 else:
     st.subheader(f"Total Number of Flights by Day of the Week for {selected_month}")
 
-st.write("The bar chart below shows the total number of flights scheduled for each day of the week based on the selected month(s) of 2023.")
+st.write("The bar chart below shows the total number of flights scheduled for each day of the week based on the selected month(s).")
+
 
-# extracting day of the week information and then grouping the data by it and total flights.
-selected_month_filtered['DayOfWeek'] = selected_month_filtered['FL_DATE'].dt.day_name()
-flights_by_day = selected_month_filtered.groupby('DayOfWeek')['FL_NUMBER'].count().reset_index(name='TotalFlights')
+@figures.chart('Home: day of week')
+def day_of_week_chart(in_range):
+    # grouping the data by the day of the week and total flights.
+    flights_by_day = queries.days(in_range).reset_index(name='TotalFlights')
 
-# plotting and adding a tooltip.
-fig2 = px.bar(flights_by_day, x='DayOfWeek', y='TotalFlights', 
-             title=f'Total Number of Flights by Day of the Week',
-             labels={'DayOfWeek': 'Day Of Week', 'TotalFlights': 'Total Flights'})
-fig2.update_xaxes(categoryorder='array', categoryarray=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
-fig2.update_traces(hovertemplate='<b>Day of the Week:</b> %{label}<br><b>Total Flights:</b> %{value:,.0f}<extra></extra>', marker_color='#048092')
+    # plotting and adding a tooltip.
+    fig2 = px.bar(flights_by_day, x='DayOfWeek', y='TotalFlights', 
+                 title=f'Total Number of Flights by Day of the Week',
+                 labels={'DayOfWeek': 'Day Of Week', 'TotalFlights': 'Total Flights'})
+    fig2.update_xaxes(categoryorder='array', categoryarray=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+    fig2.update_traces(hovertemplate='<b>Day of the Week:</b> %{label}<br><b>Total Flights:</b> %{value:,.0f}<extra></extra>', marker_color='#048092')
+    return fig2
+
+
+fig2 = day_of_week_chart(in_range)
+profile.mark('day of week: figure')
 st.plotly_chart(fig2)
+profile.mark('day of week: render')
 
 
 
@@ -139,18 +161,28 @@ if selected_month == "All":
 else:
     st.subheader(f"Top 10 Busiest Airports for {selected_month}")
 
-st.write("The tree map below shows the top 10 busiest airports based on the previously selected month(s) of 2023.")
+st.write("The tree map below shows the top 10 busiest airports based on the previously selected month(s).")
+
+
 
-# creating a dataframe with the top 10 busiest airports and putting that into the treemap. 
-top_airports = top_airports['ORIGIN'].value_counts().nlargest(10).reset_index()
-top_airports.columns = ['Airport', 'Number of Flights']
+@figures.chart('Home: top airports')
+def top_airports_chart(in_range):
+    # creating a dataframe with the top 10 busiest airports and putting that into the treemap. 
+    top_airports = queries.top(in_range, 'ORIGIN').reset_index()
+    top_airports.columns = ['Airport', 'Number of Flights']
 
-# plotting and adding a tooltip.
-fig3 = px.treemap(top_airports, path=['Airport'], values='Number of Flights', title=f'Top 10 Busiest Airports',
-                  color='Number of Flights', color_continuous_scale='bluyl')
-fig3.update_traces(textinfo='label+value', hovertemplate='<b>Airport:</b> %{label}<br><b>Number of Flights:</b> %{value}<extra></extra>')
-fig3.update_layout(margin=dict(t=50, l=25, r=25, b=25))
+    # plotting and adding a tooltip.
+    fig3 = px.treemap(top_airports, path=['Airport'], values='Number of Flights', title=f'Top 10 Busiest Airports',
+                      color='Number of Flights', color_continuous_scale='bluyl')
+    fig3.update_traces(textinfo='label+value', hovertemplate='<b>Airport:</b> %{label}<br><b>Number of Flights:</b> %{value}<extra></extra>')
+    fig3.update_layout(margin=dict(t=50, l=25, r=25, b=25))
+    return fig3
+
+
+fig3 = top_airports_chart(in_range)
+profile.mark('top airports: figure')
 st.plotly_chart(fig3)
+profile.mark('top airports: render')
 
 
 
@@ -160,17 +192,27 @@ if selected_month == "All":
 else:
     st.subheader(f"Top 10 Airlines for {selected_month}")
 
-st.write("The bar chart below shows the top 10 airlines based on the number of flights for the the previously selected month(s) of 2023.")
+st.write("The bar chart below shows the top 10 airlines based on the number of flights for the the previously selected month(s).")
+
 
-# getting the top 10 airlines for the selected month.
-top_airlines = top_airlines.groupby('AIRLINE')['FL_NUMBER'].count().nlargest(10).reset_index()
-top_airlines.columns = ['Airlines', 'Number of Flights']
 
-# plotting and adding a tool tip.
-fig4 = px.bar(top_airlines, x='Airlines', y='Number of Flights', 
-              title=f'Top 10 Airlines by Number of Flights')
-fig4.update_traces(hovertemplate='<b>Airline:</b> %{x}<br><b>Number of Flights:</b> %{y:,.0f}<extra></extra>', marker_color='#048092')
+@figures.chart('Home: top airlines')
+def top_airlines_chart(in_range):
+    # getting the top 10 airlines for the selected month.
+    top_airlines = queries.top(in_range, 'AIRLINE').reset_index()
+    top_airlines.columns = ['Airlines', 'Number of Flights']
+
+    # plotting and adding a tool tip.
+    fig4 = px.bar(top_airlines, x='Airlines', y='Number of Flights', 
+                  title=f'Top 10 Airlines by Number of Flights')
+    fig4.update_traces(hovertemplate='<b>Airline:</b> %{x}<br><b>Number of Flights:</b> %{y:,.0f}<extra></extra>', marker_color='#048092')
+    return fig4
+
+
+fig4 = top_airlines_chart(in_range)
+profile.mark('top airlines: figure')
 st.plotly_chart(fig4)
+profile.mark('top airlines: render')
 
 
 
@@ -180,21 +222,26 @@ if selected_month == "All":
 else:
     st.subheader(f"Distribution of Flight Status for {selected_month}")
 
-st.write("The donut chart below shows the distribution in percentage of the flights that were on time, delayed, cancelled, or diverted for the previously selected month(s) of 2023.")
+st.write("The donut chart below shows the distribution in percentage of the flights that were on time, delayed, cancelled, or diverted for the previously selected month(s).")
+
+
+
+@figures.chart('Home: flight status')
+def flight_status_chart(in_range):
+    # counting delayed, diverted, canceled and on time flights for the selected month and creating a data frame for the flight status counts.
+    flight_status_counts = queries.statuses(in_range, 'ArrStatus', queries.HOME_STATUSES)
+    flight_status_counts = flight_status_counts.rename_axis('Status').reset_index(name='Count')
 
-# counting delayed, diverted and canceled flights for the selected month.
-delayed = len(filtered_status[filtered_status['ARR_DELAY'] > 0])
-diverted = len(filtered_status[filtered_status['DIVERTED'] == 1])
-cancelled = len(filtered_status[filtered_status['CANCELLED'] == 1])
-ontime = len(filtered_status[(filtered_status['ARR_DELAY'] <= 0) & (filtered_status['DIVERTED'] == 0) & (filtered_status['CANCELLED'] == 0)])
+    # plotting and adding a tooltip.
+    fig5 = px.pie(flight_status_counts, values='Count',names='Status', hole=0.5, title=f'Distribution of Flight Status')
+    fig5.update_traces(textinfo='percent+label', hovertemplate='<b>Flight Status:</b> %{label}<br><b>Total Flights:</b> %{value}')
+    return fig5
 
-# creating a data frame for flight status counts.
-flight_status_counts = pd.DataFrame({'Status': ['Delayed', 'Diverted', 'Cancelled', 'On-time'],'Count': [delayed, diverted, cancelled, ontime]})
 
-# plotting and adding a tooltip.
-fig5 = px.pie(flight_status_counts, values='Count',names='Status', hole=0.5, title=f'Distribution of Flight Status')
-fig5.update_traces(textinfo='percent+label', hovertemplate='<b>Flight Status:</b> %{label}<br><b>Total Flights:</b> %{value}')
+fig5 = flight_status_chart(in_range)
+profile.mark('flight status: figure')
 st.plotly_chart(fig5)
+profile.mark('flight status: render')
 
 
 
@@ -213,42 +260,36 @@ st.write("3. NAS Delay ✈ Delay by National Aviation System (NAS) caused due to
 st.write("4. Security Delay ✈ Delay caused by security related issues, such as terminal evacuations, aircraft re-boarding due to security breaches, malfunctioning screening equipment, or long queues exceeding 29 minutes at screening areas.")
 st.write("5. Late Aircraft Delay ✈ Delay due to delayed aircrafts.")
 
-# renaming my columns for clarity and to increase the readability in my plot.
-flights_data.rename(columns={'DELAY_DUE_CARRIER': 'Carrier Delay', 'DELAY_DUE_WEATHER': 'Weather Delay',
-                             'DELAY_DUE_NAS': 'NAS Delay', 'DELAY_DUE_SECURITY': 'Security Delay', 
-                             'DELAY_DUE_LATE_AIRCRAFT': 'Late Aircraft Delay'}, inplace=True)
+# creating a list of reasons for delay and then add a select box to choose from the list.
+delay_reasons = list(data.DELAY_TYPES.values())
+selected_reason = st.selectbox("Select Reason for Delay:", delay_reasons)
 
-# filtering delayed flights. 
-delayed_flights = flights_data[flights_data['ARR_DELAY'] > 0]
 
-# once again filtering delayed_flights data for the selected month.
-if selected_month == 'All':
-    delayed_flights_selected_month = delayed_flights
-else:
-    selected_month_index = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August'].index(selected_month) + 1
-    delayed_flights_selected_month = delayed_flights[delayed_flights['FL_DATE'].dt.month == selected_month_index]
 
-# creating a list of reasons for delay and then add a select box to choose from the list.
-delay_reasons = ['Carrier Delay', 'Weather Delay', 'NAS Delay', 'Security Delay', 'Late Aircraft Delay']
-selected_reason = st.selectbox("Select Reason for Delay:", delay_reasons)
+@figures.chart('Home: top delayed airports')
+def top_delayed_airports_chart(in_range, selected_reason):
+    # counting the delayed flights by the arrival airport for the selected month, where the flights are only counted if they were delayed by the selected reason
+    # (late aircraft delays count all of the delayed flights), and selecting the top 5 airports.
+    top_5_airports_selected_month = queries.delayed_airports(in_range, selected_reason).reset_index()
+    top_5_airports_selected_month.columns = ['Airport', 'DelayedFlights']
 
-# filtering the data based on selected delay reason.
-if selected_reason != 'Late Aircraft Delay':  
-    delayed_flights_selected_month = delayed_flights_selected_month[delayed_flights_selected_month[selected_reason] > 0]
-
-# counting delayed flights by the airport.
-delayed_by_airport_month = delayed_flights_selected_month.groupby('DEST')['FL_NUMBER'].count().reset_index()
-delayed_by_airport_month.columns = ['Airport', 'DelayedFlights']
-
-# sorting and selecting the top 5 airports
-delayed_by_airport_sorted_selected_month = delayed_by_airport_month.sort_values(by='DelayedFlights', ascending=False)
-top_5_airports_selected_month = delayed_by_airport_sorted_selected_month.head(5)
-top_5_airports_sorted_selected_month = top_5_airports_selected_month.sort_values(by='DelayedFlights', ascending=True)
-
-# make the horizontal bar chart for the top 5 airports with a tooltip.
-fig6 = px.bar(top_5_airports_sorted_selected_month, y='Airport', x='DelayedFlights',
-             title=f'Top 5 Airports with the Highest Number of Delayed Flights due to {selected_reason}',
-             labels={'Airport': 'Airport Code', 'DelayedFlights': 'Number of Delayed Flights'},
-             orientation='h')
-fig6.update_traces(hovertemplate='<b>Airport:</b> %{y}<br><b>Number of Delayed Flights:</b> %{x:,.0f}<extra></extra>', marker_color='#048092')
+    # sorting the top 5 airports so that the most delayed one is at the top of the chart.
+    top_5_airports_sorted_selected_month = top_5_airports_selected_month.sort_values(by='DelayedFlights', ascending=True)
+
+    # make the horizontal bar chart for the top 5 airports with a tooltip.
+    fig6 = px.bar(top_5_airports_sorted_selected_month, y='Airport', x='DelayedFlights',
+                 title=f'Top 5 Airports with the Highest Number of Delayed Flights due to {selected_reason}',
+                 labels={'Airport': 'Airport Code', 'DelayedFlights': 'Number of Delayed Flights'},
+                 orientation='h')
+    fig6.update_traces(hovertemplate='<b>Airport:</b> %{y}<br><b>Number of Delayed Flights:</b> %{x:,.0f}<extra></extra>', marker_color='#048092')
+    return fig6
+
+
+fig6 = top_delayed_airports_chart(in_range, selected_reason)
+profile.mark('top delayed airports: figure')
 st.plotly_chart(fig6)
+profile.mark('top delayed airports: render')
+
+
+
+profile.finish()
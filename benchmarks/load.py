@@ -0,0 +1,118 @@
+import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from benchmarks.run import commit
+from flights import api, store
+
+
+def workload(url, count, seed=0):
+    # a mix of the requests the pages make, for the airports and airlines the server has (so that some of them repeat, like real clients).
+    host = urlsplit(url)
+    connection = http.client.HTTPConnection(host.hostname, host.port)
+    airports = list(fetch(connection, '/airports/top'))
+    airlines = list(fetch(connection, '/airlines/top'))
+    months = list(fetch(connection, '/months'))
+    connection.close()
+    reasons = list(store.DELAY_TYPES.values())
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        month = rng.choice(months)
+        dates = {'start': f'{month}-01', 'end': f'{month}-{rng.randint(7, 28):02d}'} if rng.random() < 0.5 else {}
+        pair = {'view': rng.choice(['departures', 'arrivals']), 'airport': rng.choice(airports), 'airline': rng.choice(airlines)}
+        requests.append(rng.choice([
+            ('/months', {}),
+            ('/months', {'airline': rng.sample(airlines, 2)}),
+            ('/days', dates),
+            ('/airports/top', dates),
+            ('/airlines/top', dates),
+            ('/statuses', dates),
+            ('/delayed-airports', {**dates, 'reason': rng.choice(reasons)}),
+            ('/statuses', pair),
+            ('/hours', pair),
+            ('/causes', pair),
+        ]))
+    return requests
+
+
+def fetch(connection, path, params=None):
+    connection.request('GET', path + ('?' + urlencode(params, doseq=True) if params else ''))
+    response = connection.getresponse()
+    return json.loads(response.read())
+
+
+def client(url, requests, batch):
+    # sending requests over one kept alive connection, one at a time or in batches, and timing each round trip.
+    host = urlsplit(url)
+    connection = http.client.HTTPConnection(host.hostname, host.port)
+    latencies, errors = [], 0
+    for i in range(0, len(requests), batch):
+        start = time.perf_counter()
+        if batch == 1:
+            path, params = requests[i]
+            connection.request('GET', path + ('?' + urlencode(params, doseq=True) if params else ''))
+        else:
+            body = json.dumps([{'path': path, 'params': params} for path, params in requests[i:i + batch]])
+            connection.request('POST', '/batch', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        errors += response.status != 200
+    connection.close()
+    return latencies, errors
+
+
+def load(url, count, clients, batch=1):
+    requests = workload(url, count)
+    parts = [requests[i::clients] for i in range(clients)]
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(lambda part: client(url, part, batch), parts))
+    seconds = time.perf_counter() - start
+    latencies = np.concatenate([result[0] for result in results]) * 1000
+    return {
+        'requests': count, 'clients': clients, 'batch': batch, 'seconds': seconds, 'requests_per_s': count / seconds,
+        'errors': sum(result[1] for result in results),
+        'latency_ms': {f'p{q}': float(np.percentile(latencies, q)) for q in (50, 90, 99)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the query service (flights.api) with concurrent clients on localhost.")
+    parser.add_argument("--url", help="A running server (default: start one in this process for the csv).")
+    parser.add_argument("--csv", default=store.CSV_PATH)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--clients", default="1,8,32", help="Comma separated numbers of concurrent clients (default: 1,8,32).")
+    parser.add_argument("--batch", type=int, default=1, help="Requests sent in each POST /batch (default: 1, a GET for each).")
+    parser.add_argument("--output", help="Write the results as json to this file (default: stdout).")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        httpd = api.server(api.Service.load(args.csv), port=0)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{httpd.server_address[1]}'
+    results = []
+    for clients in map(int, args.clients.split(',')):
+        result = load(url, args.requests, clients, args.batch)
+        results.append(result)
+        print(f"{clients:>4} clients  {result['requests_per_s']:10,.0f} requests/s  p50 {result['latency_ms']['p50']:7.2f}ms  "
+              f"p99 {result['latency_ms']['p99']:7.2f}ms  errors {result['errors']}", file=sys.stderr)
+    report = {'commit': commit(), 'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'url': url, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,162 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic import generate, parse_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the widget interactions of each page, as (name, function that changes the widget). Each one is timed as a separate rerun.
+INTERACTIONS = {
+    'Home.py': [
+        ('radio: airline trends', lambda at: at.radio[0].set_value('Flight Trends by Specific Airline(s)')),
+        ('multiselect: airlines', lambda at: at.multiselect[0].set_value(at.multiselect[0].options[:3])),
+        # the month labels come from the data (with the year when it covers more than one), so the first and last months are picked from the
+        # options, which are 'All', the months and 'Custom Date Range'.
+        ('selectbox: month', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[1])),
+        ('selectbox: month', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[-2])),
+        ('selectbox: delay reason', lambda at: at.selectbox[1].set_value('Weather Delay')),
+        ('selectbox: delay reason', lambda at: at.selectbox[1].set_value('NAS Delay')),
+    ],
+    'pages/1_Departures.py': [
+        ('selectbox: airport', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[1])),
+        ('selectbox: airline', lambda at: at.selectbox[1].set_value(at.selectbox[1].options[-1])),
+        ('selectbox: airport', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[-1])),
+    ],
+    'pages/2_Arrivals.py': [
+        ('selectbox: airport', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[1])),
+        ('selectbox: airline', lambda at: at.selectbox[1].set_value(at.selectbox[1].options[-1])),
+        ('selectbox: airport', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[-1])),
+    ],
+    'pages/3_Routes.py': [
+        ('selectbox: month', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[1])),
+        ('selectbox: airline', lambda at: at.selectbox[1].set_value(at.selectbox[1].options[1])),
+        ('slider: minimum flights', lambda at: at.slider[0].set_value(1)),
+        ('select_slider: map routes', lambda at: at.select_slider[0].set_value(200)),
+    ],
+    'pages/4_Delay_Risk.py': [
+        ('selectbox: airline', lambda at: at.selectbox[0].set_value(at.selectbox[0].options[-1])),
+        ('selectbox: departure airport', lambda at: at.selectbox[1].set_value(at.selectbox[1].options[1])),
+        ('selectbox: arrival airport', lambda at: at.selectbox[2].set_value(at.selectbox[2].options[-1])),
+    ],
+}
+
+
+def workdir(csv, path):
+    # the pages read data/flights_sample_3m.csv and the gifs relative to where they run, so each benchmark runs in its own folder
+    # which links to the synthetic csv and to the repo's gifs.
+    os.makedirs(os.path.join(path, 'data'), exist_ok=True)
+    for name in os.listdir(os.path.join(ROOT, 'data')):
+        if name.endswith('.gif') and not os.path.exists(os.path.join(path, 'data', name)):
+            os.symlink(os.path.join(ROOT, 'data', name), os.path.join(path, 'data', name))
+    link = os.path.join(path, 'data', 'flights_sample_3m.csv')
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.abspath(csv), link)
+    return path
+
+
+def prepare(path, mode):
+    # optionally converting the csv the same way it would be done before a deploy.
+    from flights import ingest, store
+    csv = os.path.join(path, 'data', 'flights_sample_3m.csv')
+    start = time.perf_counter()
+    if mode == 'parquet':
+        store.convert(csv)
+    elif mode == 'ingest':
+        ingest.ingest(csv)
+    return time.perf_counter() - start
+
+
+def measure(page, path, timeout):
+    # running a page headlessly in a fresh process (so that caches and memory start empty): the first run is the cold start, and then
+    # every interaction is a rerun. Returns the timings in seconds and the peak resident memory of the process.
+    from streamlit.testing.v1 import AppTest
+    os.chdir(path)
+    sys.path.insert(0, ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=timeout)
+
+    start = time.perf_counter()
+    at.run()
+    result = {'page': page, 'cold_start_s': time.perf_counter() - start, 'reruns': []}
+    for name, interact in INTERACTIONS[page]:
+        interact(at)
+        start = time.perf_counter()
+        at.run()
+        result['reruns'].append({'widget': name, 'seconds': time.perf_counter() - start})
+    result['errors'] = [str(exception.message) for exception in at.exception]
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def peak_rss_mb():
+    # the high water mark of the process's memory. On linux this is read from /proc, since ru_maxrss can carry over the parent's
+    # high water mark into a newly started process.
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, pages, folder, mode='csv', timeout=3600):
+    results = []
+    spawn = multiprocessing.get_context('spawn')
+    for rows in sizes:
+        csv = os.path.join(folder, f'flights_{rows}.csv')
+        if not os.path.exists(csv):
+            generate(csv, rows)
+        path = workdir(csv, os.path.join(folder, f'run_{rows}'))
+        # the store, the aggregates, the memory mapped files and the views of the last run, which would otherwise be loaded instead.
+        for stale in ('flights_sample_3m.parquet', 'flights_sample_3m.cube', 'flights_sample_3m.arrow', 'flights_sample_3m.cube.arrow',
+                      'flights_sample_3m.views.npz'):
+            stale = os.path.join(path, 'data', stale)
+            if os.path.isdir(stale):
+                shutil.rmtree(stale, ignore_errors=True)
+            elif os.path.exists(stale):
+                os.remove(stale)
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=spawn) as pool:
+            prepare_s = pool.submit(prepare, path, mode).result()
+        for page in pages:
+            with concurrent.futures.ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                result = pool.submit(measure, page, path, timeout).result()
+            result.update(rows=rows, mode=mode, prepare_s=prepare_s)
+            results.append(result)
+            print(f"{rows:>12,} {page:<24} cold {result['cold_start_s']:8.2f}s  "
+                  f"rerun {max(r['seconds'] for r in result['reruns']):8.3f}s max  rss {result['peak_rss_mb']:8.0f}MB", file=sys.stderr)
+    return {'commit': commit(), 'python': platform.python_version(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cold start, reruns and memory of the pages on synthetic data.")
+    parser.add_argument("--rows", default="3m,10m,30m", help="Comma separated dataset sizes (default: 3m,10m,30m).")
+    parser.add_argument("--pages", default=",".join(INTERACTIONS), help="Comma separated pages to run (default: all).")
+    parser.add_argument("--mode", choices=['csv', 'parquet', 'ingest'], default='csv',
+                        help="How the data is prepared before the pages run (default: csv, i.e. not prepared).")
+    parser.add_argument("--folder", default=os.path.join(ROOT, '.benchmarks'), help="Where the synthetic data is kept between runs.")
+    parser.add_argument("--output", help="Write the results as json to this file (default: stdout).")
+    args = parser.parse_args()
+
+    os.makedirs(args.folder, exist_ok=True)
+    report = run([parse_rows(size) for size in args.rows.split(',')], args.pages.split(','), args.folder, args.mode)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,148 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# (name, code, DOT code) of the airlines in the BTS data.
+AIRLINES = [
+    ('Southwest Airlines Co.', 'WN', 19393), ('Delta Air Lines Inc.', 'DL', 19790), ('American Airlines Inc.', 'AA', 19805),
+    ('SkyWest Airlines Inc.', 'OO', 20304), ('United Air Lines Inc.', 'UA', 19977), ('Republic Airline', 'YX', 20452),
+    ('Envoy Air', 'MQ', 20398), ('Endeavor Air Inc.', '9E', 20363), ('JetBlue Airways', 'B6', 20409),
+    ('PSA Airlines Inc.', 'OH', 20397), ('Alaska Airlines Inc.', 'AS', 19930), ('Spirit Air Lines', 'NK', 20416),
+    ('Frontier Airlines Inc.', 'F9', 20436), ('Allegiant Air', 'G4', 20368), ('Hawaiian Airlines Inc.', 'HA', 19690),
+]
+
+# (code, city) of the airports, roughly ordered by how busy they are.
+AIRPORTS = [
+    ('ATL', 'Atlanta, GA'), ('DFW', 'Dallas/Fort Worth, TX'), ('DEN', 'Denver, CO'), ('ORD', 'Chicago, IL'), ('LAX', 'Los Angeles, CA'),
+    ('CLT', 'Charlotte, NC'), ('LAS', 'Las Vegas, NV'), ('PHX', 'Phoenix, AZ'), ('MCO', 'Orlando, FL'), ('SEA', 'Seattle, WA'),
+    ('MIA', 'Miami, FL'), ('IAH', 'Houston, TX'), ('JFK', 'New York, NY'), ('SFO', 'San Francisco, CA'), ('EWR', 'Newark, NJ'),
+    ('FLL', 'Fort Lauderdale, FL'), ('MSP', 'Minneapolis, MN'), ('LGA', 'New York, NY'), ('DTW', 'Detroit, MI'), ('BOS', 'Boston, MA'),
+    ('SLC', 'Salt Lake City, UT'), ('PHL', 'Philadelphia, PA'), ('BWI', 'Baltimore, MD'), ('TPA', 'Tampa, FL'), ('SAN', 'San Diego, CA'),
+    ('MDW', 'Chicago, IL'), ('BNA', 'Nashville, TN'), ('IAD', 'Washington, DC'), ('DAL', 'Dallas, TX'), ('DCA', 'Washington, DC'),
+    ('AUS', 'Austin, TX'), ('HNL', 'Honolulu, HI'), ('PDX', 'Portland, OR'), ('HOU', 'Houston, TX'), ('STL', 'St. Louis, MO'),
+    ('RDU', 'Raleigh/Durham, NC'), ('SMF', 'Sacramento, CA'), ('MSY', 'New Orleans, LA'), ('SJC', 'San Jose, CA'), ('OAK', 'Oakland, CA'),
+    ('SNA', 'Santa Ana, CA'), ('MCI', 'Kansas City, MO'), ('SAT', 'San Antonio, TX'), ('CLE', 'Cleveland, OH'), ('IND', 'Indianapolis, IN'),
+    ('PIT', 'Pittsburgh, PA'), ('CMH', 'Columbus, OH'), ('CVG', 'Cincinnati, OH'), ('RSW', 'Fort Myers, FL'), ('OGG', 'Kahului, HI'),
+    ('JAX', 'Jacksonville, FL'), ('ABQ', 'Albuquerque, NM'), ('ANC', 'Anchorage, AK'), ('BDL', 'Hartford, CT'), ('MKE', 'Milwaukee, WI'),
+    ('ONT', 'Ontario, CA'), ('BUR', 'Burbank, CA'), ('OMA', 'Omaha, NE'), ('BOI', 'Boise, ID'), ('RNO', 'Reno, NV'),
+]
+
+DELAY_COLUMNS = ['DELAY_DUE_CARRIER', 'DELAY_DUE_WEATHER', 'DELAY_DUE_NAS', 'DELAY_DUE_SECURITY', 'DELAY_DUE_LATE_AIRCRAFT']
+
+
+def hhmm(minutes, midnight=0):
+    # minutes since midnight as an HHMM number, where the actual times in the BTS data use 2400 for midnight.
+    minutes = minutes % 1440
+    times = minutes // 60 * 100 + minutes % 60
+    return np.where(times == 0, midnight, times)
+
+
+def chunk(rng, rows, start, end):
+    # a chunk of flights with the same columns, types and formats as flights_sample_3m.csv.
+    airline = rng.choice(len(AIRLINES), rows, p=zipf(len(AIRLINES)))
+    origin = rng.choice(len(AIRPORTS), rows, p=zipf(len(AIRPORTS)))
+    dest = (origin + rng.integers(1, len(AIRPORTS), rows)) % len(AIRPORTS)
+    days = (end - start).days + 1
+    dates = start + pd.to_timedelta(rng.integers(0, days, rows), unit='D')
+
+    # scheduled times between 5 AM and midnight, and a flight time that depends on the distance.
+    distance = rng.integers(80, 2800, rows).astype(float)
+    crs_elapsed = np.round(30 + distance / 8 + rng.normal(0, 10, rows)).clip(25)
+    crs_dep = rng.integers(5 * 60, 24 * 60, rows)
+    crs_arr = crs_dep + crs_elapsed.astype(int)
+
+    cancelled = rng.random(rows) < 0.02
+    diverted = ~cancelled & (rng.random(rows) < 0.002)
+    dep_delay = np.round(rng.gamma(0.6, 30, rows) - 8)
+    taxi_out = np.round(rng.gamma(4, 4, rows)).clip(1)
+    taxi_in = np.round(rng.gamma(3, 2.5, rows)).clip(1)
+    elapsed = np.round(crs_elapsed + rng.normal(-3, 8, rows)).clip(20)
+    arr_delay = dep_delay + (elapsed - crs_elapsed)
+    air_time = (elapsed - taxi_out - taxi_in).clip(10)
+
+    dep_time = (crs_dep + dep_delay).astype(int)
+    wheels_off = dep_time + taxi_out.astype(int)
+    wheels_on = wheels_off + air_time.astype(int)
+    arr_time = wheels_on + taxi_in.astype(int)
+
+    names, codes = np.array([name for name, _, _ in AIRLINES]), np.array([code for _, code, _ in AIRLINES])
+    airports, cities = np.array([code for code, _ in AIRPORTS]), np.array([city for _, city in AIRPORTS])
+    flights = pd.DataFrame({
+        'FL_DATE': dates.strftime('%Y-%m-%d'),
+        'AIRLINE': names[airline],
+        'AIRLINE_DOT': np.char.add(np.char.add(names, ': '), codes)[airline],
+        'AIRLINE_CODE': codes[airline],
+        'DOT_CODE': np.array([dot for _, _, dot in AIRLINES])[airline],
+        'FL_NUMBER': rng.integers(1, 7000, rows),
+        'ORIGIN': airports[origin],
+        'ORIGIN_CITY': cities[origin],
+        'DEST': airports[dest],
+        'DEST_CITY': cities[dest],
+        'CRS_DEP_TIME': hhmm(crs_dep),
+        'DEP_TIME': hhmm(dep_time, 2400).astype(float),
+        'DEP_DELAY': dep_delay,
+        'TAXI_OUT': taxi_out,
+        'WHEELS_OFF': hhmm(wheels_off, 2400).astype(float),
+        'WHEELS_ON': hhmm(wheels_on, 2400).astype(float),
+        'TAXI_IN': taxi_in,
+        'CRS_ARR_TIME': hhmm(crs_arr),
+        'ARR_TIME': hhmm(arr_time, 2400).astype(float),
+        'ARR_DELAY': arr_delay,
+        'CANCELLED': cancelled.astype(float),
+        'CANCELLATION_CODE': np.where(cancelled, rng.choice(list('ABCD'), rows, p=[0.3, 0.5, 0.15, 0.05]), None),
+        'DIVERTED': diverted.astype(float),
+        'CRS_ELAPSED_TIME': crs_elapsed,
+        'ELAPSED_TIME': elapsed,
+        'AIR_TIME': air_time,
+        'DISTANCE': distance,
+    })
+
+    # cancelled flights have no times after the scheduled ones, and diverted flights never arrive at their destination.
+    flights.loc[cancelled, ['DEP_TIME', 'DEP_DELAY', 'TAXI_OUT', 'WHEELS_OFF']] = np.nan
+    flights.loc[cancelled | diverted, ['WHEELS_ON', 'TAXI_IN', 'ARR_TIME', 'ARR_DELAY', 'ELAPSED_TIME', 'AIR_TIME']] = np.nan
+
+    # the delay causes are only reported for flights that arrived at least 15 minutes late, and add up to the arrival delay.
+    late = (flights['ARR_DELAY'] >= 15).to_numpy()
+    shares = rng.dirichlet([2, 0.3, 1.5, 0.05, 2], rows) * (rng.random((rows, 5)) < 0.6)
+    shares[shares.sum(axis=1) == 0, 0] = 1
+    shares = shares / shares.sum(axis=1, keepdims=True)
+    causes = np.floor(shares * flights['ARR_DELAY'].fillna(0).to_numpy()[:, None])
+    causes[:, 0] += flights['ARR_DELAY'].fillna(0).to_numpy() - causes.sum(axis=1)
+    for i, column in enumerate(DELAY_COLUMNS):
+        flights[column] = np.where(late, causes[:, i], np.nan)
+    return flights
+
+
+def zipf(n, s=0.8):
+    # a long tailed distribution where the first items are the most common, like real airports and airlines.
+    weights = 1 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def generate(path, rows, start='2023-01-01', end='2023-08-31', seed=0, chunk_rows=1_000_000):
+    # writing the csv one chunk at a time so that any number of rows can be generated with bounded memory.
+    rng = np.random.default_rng(seed)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    for i, offset in enumerate(range(0, rows, chunk_rows)):
+        flights = chunk(rng, min(chunk_rows, rows - offset), start, end)
+        flights.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+def parse_rows(value):
+    # allowing sizes like 3m or 500k.
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1].lower(), 1)
+    return int(float(value.rstrip('kKmM')) * multiplier)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic flights csv with the same schema as flights_sample_3m.csv.")
+    parser.add_argument("rows", type=parse_rows, help="Number of flights, e.g. 3m.")
+    parser.add_argument("path")
+    parser.add_argument("--start", default='2023-01-01')
+    parser.add_argument("--end", default='2023-08-31')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"Wrote {generate(args.path, args.rows, args.start, args.end, args.seed)}")
@@ -0,0 +1,265 @@
+import argparse
+import json
+import re
+import traceback
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from flights import prewarm, queries, store
+from flights.cube import Cube
+
+# the most answers which are kept, as json, by default.
+CACHE_SIZE = 4096
+
+
+def scalar(value):
+    # a number from the cube as a json value, where a missing average is null.
+    value = value.item() if isinstance(value, np.generic) else value
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def message(error):
+    # the message of an error, without the quotes a KeyError adds.
+    return str(error.args[0]) if error.args else str(error)
+
+
+def series(values):
+    return {str(key): scalar(value) for key, value in values.items()}
+
+
+def error(code, text):
+    return json.dumps({'error': text, 'status': code}).encode()
+
+
+class NotFound(LookupError):
+    # an endpoint which doesn't exist (a 404), unlike a KeyError from inside a query which is a bug in the service (a 500).
+    pass
+
+
+def parameters(params):
+    # the parameters of a request as the key of its answer, where each one has a value or a list of values (like a parsed query string).
+    if params is None:
+        return ()
+    if not isinstance(params, dict):
+        raise ValueError("The params must be a json object")
+    key = []
+    for name, value in params.items():
+        values = tuple(value) if isinstance(value, (list, tuple)) else (value,)
+        if not all(isinstance(value, (str, int, float)) for value in values):
+            raise ValueError(f"The parameter {name} must be a string, a number or a list of them")
+        key.append((name, values))
+    return tuple(sorted(key))
+
+
+class Service:
+    # the numbers the home, departures and arrivals pages show, answered from the same cube queries as the pages for other tools. Every
+    # answer is kept as json in a least recently used cache, keyed by the endpoint and its parameters, so a repeated request is a lookup.
+
+    def __init__(self, cube, cache_size=CACHE_SIZE):
+        self.cube = cube
+        self.endpoints = {
+            '/months': self.months,
+            '/days': self.days,
+            '/airports/top': self.top_airports,
+            '/airlines/top': self.top_airlines,
+            '/statuses': self.statuses,
+            '/hours': self.hours,
+            '/causes': self.causes,
+            '/delayed-airports': self.delayed_airports,
+        }
+        self.cached = lru_cache(maxsize=cache_size)(self.answer)
+
+    @classmethod
+    def load(cls, csv=store.CSV_PATH, cache_size=CACHE_SIZE):
+        # the same aggregates (and precomputed views) the pages load.
+        cube = Cube.open(csv)
+        cube.views = prewarm.load_views(csv)
+        return cls(cube, cache_size)
+
+    def get(self, path, params=None):
+        # the json answer of an endpoint, where params has a value or a list of values for each parameter (like a parsed query string).
+        if not isinstance(path, str):
+            raise ValueError("The path must be a string")
+        return self.cached(path, parameters(params))
+
+    def query(self, path, **params):
+        return json.loads(self.get(path, params))
+
+    def batch(self, requests):
+        # the answers of a list of requests ({"path": ..., "params": {...}}) as one json list, where a request that fails has an error
+        # in its place with the status it would have had on its own. Requests for the same range of dates share the cube of that range,
+        # and repeated requests are answered once.
+        answers = []
+        for request in requests:
+            if not isinstance(request, dict) or 'path' not in request:
+                answers.append(error(400, "A request must be a json object with a path"))
+                continue
+            answers.append(self.respond(request['path'], request.get('params'))[1])
+        return b'[' + b','.join(answers) + b']'
+
+    def respond(self, path, params=None):
+        # the status and json body of a request, where a failed request has an error as its body.
+        try:
+            return 200, self.get(path, params)
+        except NotFound as failure:
+            return 404, error(404, message(failure))
+        except ValueError as failure:
+            return 400, error(400, message(failure))
+        except Exception as failure:
+            traceback.print_exc()
+            return 500, error(500, f"{type(failure).__name__}: {message(failure)}")
+
+    def stats(self):
+        info = self.cached.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+    def answer(self, path, key):
+        if path not in self.endpoints:
+            raise NotFound(f"Unknown endpoint {path}")
+        params = dict(key)
+        return json.dumps(self.endpoints[path](params)).encode()
+
+    # the parameters of the endpoints.
+
+    def one(self, params, name, default=None):
+        values = params.get(name)
+        if not values:
+            if default is None:
+                raise ValueError(f"Missing parameter {name}")
+            return default
+        return values[0]
+
+    def in_range(self, params):
+        # the cube of the flights between the start and end dates (both included), or of all of them.
+        first_day, last_day = self.cube.dates()
+        start, end = np.datetime64(self.one(params, 'start', first_day), 'D'), np.datetime64(self.one(params, 'end', last_day), 'D')
+        return self.cube.between(start, end)
+
+    def month(self, params):
+        # the month parameter (e.g. 2023-01) as the number of months since 1970, or None when there isn't one.
+        name = self.one(params, 'month', '')
+        if not name:
+            return None
+        if not re.fullmatch(r'\d{4}-\d{2}', name) or not 1 <= int(name[5:]) <= 12:
+            raise ValueError(f"The month {name} isn't a month like 2023-01")
+        return store.partition_key(name)
+
+    def selection(self, params):
+        # the airport and airline of the departures (ORIGIN) or arrivals (DEST) page, and that page's hour and status columns.
+        view = self.one(params, 'view', 'departures')
+        if view not in prewarm.VIEWS:
+            raise ValueError(f"Unknown view {view}, use one of {', '.join(prewarm.VIEWS)}")
+        airport, hour, code = prewarm.VIEWS[view]
+        return {airport: self.one(params, 'airport'), 'AIRLINE': self.one(params, 'airline')}, hour, code
+
+    # the home page.
+
+    def months(self, params):
+        # the flights in every month, or in every month for each of the airlines asked for.
+        airlines = list(params.get('airline', ()))
+        if not airlines:
+            return series(self.cube.query('Flights', by=['Month']).rename(store.partition))
+        flights = self.cube.query('Flights', by=['AIRLINE', 'Month'], AIRLINE=airlines)
+        return {airline: series(months.droplevel('AIRLINE').rename(store.partition)) for airline, months in flights.groupby(level='AIRLINE')}
+
+    def days(self, params):
+        return series(queries.days(self.in_range(params)))
+
+    def top_airports(self, params):
+        return series(queries.top(self.in_range(params), 'ORIGIN'))
+
+    def top_airlines(self, params):
+        return series(queries.top(self.in_range(params), 'AIRLINE'))
+
+    def delayed_airports(self, params):
+        # the 5 arrival airports with the most flights delayed by a reason (late aircraft delays count all of the delayed flights).
+        reason = self.one(params, 'reason')
+        if reason not in store.DELAY_TYPES.values():
+            raise ValueError(f"Unknown reason {reason}")
+        return series(queries.delayed_airports(self.in_range(params), reason))
+
+    def statuses(self, params):
+        # the flight statuses of the home page for a range of dates, or of the departures or arrivals page for an airport and airline.
+        if 'airport' not in params:
+            return series(queries.statuses(self.in_range(params), 'ArrStatus', queries.HOME_STATUSES))
+        selection, hour, code = self.selection(params)
+        return series(queries.statuses(self.cube, code, **selection))
+
+    # the departures and arrivals pages.
+
+    def hours(self, params):
+        selection, hour, code = self.selection(params)
+        return series(queries.hours(self.cube, hour, **selection))
+
+    def causes(self, params):
+        # the flights delayed by each cause, and the average and percentiles of the delays, in all of the months or in one (e.g. 2023-01).
+        selection, hour, code = self.selection(params)
+        month = self.month(params)
+        flights, average = queries.causes(self.cube, month, **selection)
+        percentiles = queries.percentiles(self.cube, month, **selection).drop(columns='Average')
+        return {cause: {'flights': scalar(flights[cause]), 'average': scalar(average[cause]), **series(percentiles.loc[cause])}
+                for cause in flights.index}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # GET /<endpoint>?<parameters> answers one request, and POST /batch answers a json list of them.
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written separately, which would otherwise wait for the client's delayed ack on a kept alive connection.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            return self.respond(200, json.dumps(self.server.service.stats()).encode())
+        self.respond(*self.server.service.respond(url.path, parse_qs(url.query)))
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/batch':
+            return self.respond(404, error(404, f"Unknown endpoint {self.path}"))
+        try:
+            requests = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if not isinstance(requests, list):
+                raise ValueError("The body must be a json list of requests")
+        except ValueError as failure:
+            return self.respond(400, error(400, str(failure)))
+        self.respond(200, self.server.service.batch(requests))
+
+    def respond(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def server(service, host='127.0.0.1', port=8502, verbose=False):
+    # a server which answers every connection in its own thread.
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    httpd.verbose = verbose
+    return httpd
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the numbers of the dashboard as json on localhost.")
+    parser.add_argument("csv", nargs="?", default=store.CSV_PATH)
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help=f"Most answers kept in the cache (default: {CACHE_SIZE}).")
+    parser.add_argument("--verbose", action='store_true', help="Log every request.")
+    args = parser.parse_args()
+
+    httpd = server(Service.load(args.csv, args.cache_size), args.host, args.port, args.verbose)
+    print(f"Serving on http://{args.host}:{httpd.server_address[1]}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,247 @@
+import itertools
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from flights import profiling, risk, routes, sketch, store
+from flights.features import derive
+from flights.index import KeyIndex, PrefixSums
+from flights.store import DELAY_TYPES
+
+# the cuboids with these columns are sorted by them, so that selecting an airport and an airline is a slice of the cuboid.
+INDEX_KEYS = [['ORIGIN', 'AIRLINE'], ['DEST', 'AIRLINE']]
+
+# the cuboids with this column have a count for every day, which are added up over a range of dates by between().
+DATE = 'FL_DATE'
+
+# the columns with airline and airport codes.
+CODE_COLUMNS = ['AIRLINE', 'ORIGIN', 'DEST']
+
+# the measures of the delay cause cuboids, and of all the cuboids (the sketches of the delay minutes are counts of the delays in each bucket).
+CAUSE_MEASURES = ['DelayedFlights', 'CauseFlights', 'CauseMinutes', 'CauseReported']
+MEASURES = ['Flights', *CAUSE_MEASURES, *routes.MEASURES, 'DelayCount', *risk.MEASURES]
+
+# the most ranges of dates which are kept by between().
+MAX_RANGES = 32
+
+# the tokens of the cubes (see Cube.token).
+_tokens = itertools.count()
+
+
+def count(flights, dims):
+    # counting the flights in every combination of the dimensions, while keeping rows with a missing value (e.g. an unknown hour) so that totals still add up.
+    return flights.groupby(dims, observed=True, dropna=False).size().rename('Flights').reset_index()
+
+
+def rollup(cuboid, dims, measures=('Flights',)):
+    # summing a cuboid up to fewer dimensions.
+    return cuboid.groupby(dims, observed=True, dropna=False)[list(measures)].sum().reset_index()
+
+
+def delay_causes(flights, airport, delay, dims=('AIRLINE', 'Month')):
+    # for the flights that were delayed, counting how many were delayed by each cause and the total and number of reported minutes for each cause,
+    # for every airport and combination of the dimensions (e.g. airline and month). All five causes are summed together in one groupby over a
+    # (flights x causes) block of measures.
+    delayed = flights[flights[delay] > 0]
+    minutes = delayed[list(DELAY_TYPES)].to_numpy(dtype=np.float64)
+    reported = ~np.isnan(minutes)
+    measures = pd.DataFrame(np.hstack([minutes > 0, np.where(reported, minutes, 0), reported]),
+                            columns=pd.MultiIndex.from_product([CAUSE_MEASURES[1:], DELAY_TYPES.values()], names=[None, 'Cause']))
+    grouped = measures.groupby([delayed[column].to_numpy() for column in [airport, *dims]], dropna=False)
+    sums = grouped.sum()
+    sums[('DelayedFlights', '')] = grouped.size()
+
+    # turning the wide table (a column per measure and cause) into one row per airport, airline, month and cause.
+    cuboid = sums.drop(columns='DelayedFlights', level=0).stack('Cause', future_stack=True)
+    cuboid.insert(0, 'DelayedFlights', sums['DelayedFlights'].reindex(cuboid.index.droplevel('Cause')).to_numpy())
+    cuboid = cuboid.rename_axis([airport, *dims, 'Cause']).reset_index()
+    cuboid['Cause'] = pd.Categorical(cuboid['Cause'], categories=DELAY_TYPES.values())
+    counts = ['DelayedFlights', 'CauseFlights', 'CauseReported']
+    cuboid[counts] = cuboid[counts].astype(np.int64)
+    return cuboid
+
+
+def cuboids(flights):
+    # all of the cuboids the charts are answered from.
+    departure_causes = delay_causes(flights, 'ORIGIN', 'DEP_DELAY')
+    arrival_causes = delay_causes(flights, 'DEST', 'ARR_DELAY')
+    base = count(flights, ['Month', 'DayOfWeek', 'AIRLINE', 'ORIGIN', 'ArrStatus'])
+    route_table = routes.table(flights)
+    return [
+        base,
+        # smaller roll ups of the base cuboid for the charts on the home page.
+        rollup(base, ['Month', 'DayOfWeek', 'ArrStatus']),
+        rollup(base, ['Month', 'AIRLINE']),
+        rollup(base, ['Month', 'ORIGIN']),
+        # the departure and arrival pages.
+        count(flights, ['ORIGIN', 'AIRLINE', 'DepHour', 'DepStatus']),
+        count(flights, ['DEST', 'AIRLINE', 'ArrHour', 'ArrStatus']),
+        departure_causes,
+        arrival_causes,
+        # the sketches of the delay minutes of each cause, which the percentiles on the departure and arrival pages are read from.
+        sketch.sketches(flights, 'ORIGIN', 'DEP_DELAY'),
+        sketch.sketches(flights, 'DEST', 'ARR_DELAY'),
+        # the delay causes by arrival airport and month for the top airports on the home page.
+        rollup(arrival_causes, ['DEST', 'Month', 'Cause'], CAUSE_MEASURES),
+        # the counts for every day behind the charts on the home page, which are what a range of dates is answered from.
+        count(flights, [DATE, 'DayOfWeek', 'ArrStatus']),
+        count(flights, [DATE, 'ORIGIN']),
+        count(flights, [DATE, 'AIRLINE']),
+        delay_causes(flights, 'DEST', 'ARR_DELAY', [DATE])[['DEST', DATE, 'Cause', 'DelayedFlights', 'CauseFlights']],
+        # the routes page, with a smaller roll up for when no airline is selected.
+        route_table,
+        rollup(route_table, ['ORIGIN', 'DEST', 'Month'], routes.MEASURES),
+        # the delay risk page, with the flights counted by each of the columns a planned flight is scored by.
+        *risk.marginals(flights),
+    ]
+
+
+def read(path):
+    # the cuboids saved in a folder, always in the same order (that of their file names) so that the cuboids of different months line up.
+    return [pd.read_parquet(os.path.join(path, name)) for name in sorted(os.listdir(path)) if name.endswith('.parquet')]
+
+
+def dimensions(cuboid):
+    return [column for column in cuboid.columns if column not in MEASURES]
+
+
+def merge(parts):
+    # adding up the cuboids built from separate parts of the flights (e.g. chunks of a csv), which works since every measure is a sum or a count.
+    merged = []
+    for same in zip(*parts):
+        cuboid = pd.concat(same, ignore_index=True)
+        merged.append(rollup(cuboid, dimensions(cuboid), [column for column in cuboid.columns if column in MEASURES]))
+    return merged
+
+
+class Cube:
+    # a set of precomputed aggregates (cuboids) over the dimensions the charts use, so that every chart is a small lookup
+    # instead of a pass over all of the flights.
+
+    def __init__(self, cuboids):
+        # keeping the smallest cuboids first so that queries use the cheapest one which can answer them.
+        # the airline and airport codes are categoricals in the flights, but are kept as plain strings in the (much smaller) cuboids so that
+        # the query results only have the airlines and airports which are in them. The sketches, which have a row for every bucket of every
+        # airport, airline and month, keep them as categoricals since they're only ever grouped by cause and bucket.
+        cuboids = [cuboid.astype({column: 'category' if 'DelayCount' in cuboid else object for column in CODE_COLUMNS if column in cuboid})
+                   for cuboid in cuboids]
+        self.cuboids = sorted(cuboids, key=len)
+        self.indexes = {}
+        # the precomputed results of the departures and arrivals pages (see flights.prewarm), which answer their queries when they're set.
+        self.views = None
+        # what the figure cache keys the figures of the cube by instead of the cube itself (see flights.figures), which is different for
+        # every cube (e.g. the cube of a reload, or of a window of the stream after new flights came in).
+        self.token = next(_tokens)
+        # the running totals of the cuboids with a count for every day, and the cubes of the ranges of dates which were asked for last.
+        self.days = {i: PrefixSums(cuboid, DATE, [column for column in cuboid.columns if column in MEASURES])
+                     for i, cuboid in enumerate(self.cuboids) if DATE in cuboid}
+        self.ranges = {}
+        # the ranges are shared by every session (and every thread of the query service).
+        self.lock = threading.Lock()
+        for i, cuboid in enumerate(self.cuboids):
+            keys = next((keys for keys in INDEX_KEYS if set(keys) <= set(cuboid.columns)), None)
+            if keys:
+                self.indexes[i] = KeyIndex(cuboid, keys)
+                self.cuboids[i] = self.indexes[i].frame
+
+    @classmethod
+    def build(cls, flights):
+        return cls(cuboids(flights))
+
+    @classmethod
+    def open(cls, csv):
+        # the cube of the flights in a csv, read from disk when it was written by flights.ingest and otherwise built from the flights.
+        if os.path.isdir(store.cube_path(csv)):
+            return cls.load(store.cube_path(csv))
+        return cls.build(derive(store.load(csv)))
+
+    @classmethod
+    def load(cls, path):
+        # reading a cube which was saved by save(), or one which was saved with a folder per month (see flights.ingest), in which case the
+        # cuboids of all of the months are added up.
+        months = [os.path.join(path, store.partition(key)) for key in store.partitions(path)]
+        if len({tuple(sorted(name for name in os.listdir(month) if name.endswith('.parquet'))) for month in months}) > 1:
+            raise ValueError(f"The months in {path} don't have the same cuboids, ingest the data again")
+        if months:
+            return cls(merge([read(month) for month in months]))
+        return cls(read(path))
+
+    def save(self, path):
+        # writing every cuboid to its own parquet file, named after its dimensions.
+        os.makedirs(path, exist_ok=True)
+        for cuboid in self.cuboids:
+            cuboid.to_parquet(os.path.join(path, '-'.join(dimensions(cuboid)) + '.parquet'), index=False)
+
+    def cuboid(self, columns):
+        # finding the smallest cuboid which has all of the columns.
+        for i, cuboid in enumerate(self.cuboids):
+            if set(columns) <= set(cuboid.columns):
+                return i
+        raise KeyError(f"No cuboid has the columns {sorted(columns)}")
+
+    def dates(self):
+        # the first and last dates the cube has daily counts for.
+        dates = np.concatenate([days.dates for days in self.days.values()])
+        return dates.min(), dates.max()
+
+    def between(self, start, end):
+        # a cube of the flights from the start to the end date (both included), whose cuboids are the daily ones added up over the range.
+        # This is shared by every chart which uses the same range, and only the last few ranges are kept.
+        key = (np.datetime64(start, 'D'), np.datetime64(end, 'D'))
+        if key[0] > key[1]:
+            raise ValueError(f"The start date {key[0]} is after the end date {key[1]}")
+        with self.lock:
+            if key not in self.ranges:
+                if len(self.ranges) >= MAX_RANGES:
+                    self.ranges.pop(next(iter(self.ranges)))
+                cube = self.ranges[key] = Cube([days.between(*key) for days in self.days.values()])
+                # the same range of the same cube always has the same flights, even after it was let go and built again.
+                cube.token = (self.token, *key)
+            return self.ranges[key]
+
+    def select(self, i, where):
+        # the rows of a cuboid matching `where`, which uses the index (when the cuboid has one) for the leading keys that are selected.
+        cuboid = self.cuboids[i]
+        index = self.indexes.get(i)
+        if index:
+            key = []
+            for column in index.keys:
+                if column not in where or isinstance(where[column], (list, tuple, set)):
+                    break
+                key.append(where[column])
+            if key:
+                cuboid = index.slice(*key)
+                where = {dim: value for dim, value in where.items() if dim not in index.keys[:len(key)]}
+        profiling.scanned(len(cuboid))
+        for dim, value in where.items():
+            cuboid = cuboid[cuboid[dim].isin(value) if isinstance(value, (list, tuple, set)) else cuboid[dim] == value]
+        return cuboid
+
+    def query(self, measure, by=(), **where):
+        # summing a measure grouped by the dimensions in `by`, for the rows matching `where` (either a single value or a list of values per dimension).
+        # A list of measures gives a frame with a column for each of them.
+        by = list(by)
+        measures = list(measure) if isinstance(measure, list) else [measure]
+        if self.views is not None:
+            result = self.views.query(measure, by, where)
+            if result is not None:
+                return result
+        cuboid = self.select(self.cuboid([*measures, *by, *where]), where)
+        if not by:
+            return cuboid[measure].sum()
+        return cuboid.groupby(by, observed=True)[measure].sum()
+
+    def mean(self, total, count, by=(), **where):
+        # the average of a measure from its total and count, e.g. the average minutes of each delay cause.
+        return self.query(total, by, **where) / self.query(count, by, **where)
+
+    def values(self, dim, **where):
+        # the distinct values of a dimension, e.g. the airlines that fly from an airport (using a cuboid which counts all flights, not just the delayed ones).
+        for i, index in self.indexes.items():
+            depth = len(where)
+            if 'Flights' in self.cuboids[i] and index.keys[:depth + 1] == [*where, dim]:
+                return index.values(*where.values())
+        cuboid = self.select(self.cuboid([dim, 'Flights', *where]), where)
+        return sorted(cuboid[dim].dropna().unique())
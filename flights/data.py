@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from flights import mapped, prewarm, risk, store, stream
+from flights.cube import Cube
+from flights.features import derive, month_dates, month_names, period
+from flights.store import DELAY_TYPES
+
+# copy on write makes sure that any slice or filter taken by a page can never write back into the shared data.
+pd.set_option('mode.copy_on_write', True)
+
+
+# cache_resource keeps a single copy of the data per server process that is shared by every page and every session,
+# unlike cache_data which hands each rerun its own copy. The pages must only read from it and never modify it.
+# When `python -m flights.mapped` has written the prepared flights since the data last changed, they are mapped from that file instead, so
+# every process on the host shares the same physical pages.
+@st.cache_resource(show_spinner="Loading flight data...")
+def load_flights(csv=store.CSV_PATH):
+    if mapped.fresh(mapped.mapped_path(csv), csv):
+        return mapped.read(mapped.mapped_path(csv))
+    return derive(store.load(csv))
+
+
+# the aggregates every chart is answered from, loaded once per process. These are read from disk when they were written by
+# `python -m flights.ingest` (so the flights themselves are never loaded), and otherwise built from the shared data.
+def load_cube(csv=store.CSV_PATH):
+    # the time the aggregates on disk last changed is part of the cache key, so that the app picks up a month which was appended to them
+    # by `python -m flights.ingest --append-to` (which replaces a month's folder in one step, updating the time of the cube's folder).
+    return cached_cube(csv, cube_modified(csv))
+
+
+def cube_modified(csv):
+    cube_path = store.cube_path(csv)
+    return os.stat(cube_path).st_mtime_ns if os.path.isdir(cube_path) else None
+
+
+# only the latest aggregates are kept, so the ones from before a month was appended are let go.
+@st.cache_resource(show_spinner="Preparing charts...", max_entries=1)
+def cached_cube(csv, modified):
+    # the aggregates mapped from the files of `python -m flights.mapped` (shared by every process on the host like the flights), the ones
+    # saved by flights.ingest, or otherwise ones built from the flights.
+    if mapped.fresh(mapped.cube_path(csv), csv):
+        cube = mapped.read_cube(mapped.cube_path(csv))
+    elif os.path.isdir(store.cube_path(csv)):
+        cube = Cube.load(store.cube_path(csv))
+    else:
+        cube = Cube.build(load_flights(csv))
+    # the results of every airport and airline on the departures and arrivals pages, when `python -m flights.prewarm` has written them since the
+    # data last changed.
+    cube.views = prewarm.load_views(csv)
+    return cube
+
+
+# the delay risk model is built from the aggregates (in a few milliseconds), once for every version of them.
+def load_risk(csv=store.CSV_PATH):
+    return cached_risk(csv, cube_modified(csv))
+
+
+@st.cache_resource(show_spinner="Preparing the delay risk model...", max_entries=1)
+def cached_risk(csv, modified):
+    return risk.Model.build(cached_cube(csv, modified))
+
+
+# the rolling windows of the flight status stream (see flights.stream), which a background thread keeps up to date while the app runs.
+# There is no stream unless FLIGHTS_STREAM says where to read it from.
+@st.cache_resource(show_spinner="Connecting to the flight stream...")
+def load_stream(source=None):
+    source = source or os.environ.get(stream.ENV)
+    return stream.start(source) if source else None
+
+
+def live(cube):
+    # the aggregates of a window of the stream instead of the historical ones, when live flights are turned on in the sidebar. The charts are
+    # answered from the window as it was at the last rerun, so the refresh button (or any other widget) brings them up to date.
+    flight_stream = load_stream()
+    if flight_stream is None or not st.sidebar.toggle("Live Flights", help="Show the flights from the stream instead of the historical data."):
+        return cube
+    window = st.sidebar.radio("Window", flight_stream.names())
+    st.sidebar.button("Refresh")
+    skipped = f" ({flight_stream.skipped:,} bad lines skipped)" if flight_stream.skipped else ""
+    st.sidebar.caption(f"{flight_stream.state}: {flight_stream.events:,} flights received{skipped}, the latest departing at {flight_stream.clock or '-'}")
+    live_cube = flight_stream.cube(window)
+    if live_cube is None:
+        st.info(f"Waiting for flights from the stream ({flight_stream.state})...")
+        st.stop()
+    return live_cube
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from flights import status
+
+# month names in calendar order (january is 0).
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+
+# day of the week names in the same order as the DayOfWeek column (monday is 0).
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def month(dates):
+    # the month as the number of months since january 1970 straight from the datetime values, so that the same month of different years
+    # are kept apart (e.g. 636 is january 2023). This is also the partition the flights are stored in.
+    return dates.to_numpy().astype('datetime64[M]').astype(np.int64).astype(np.int16)
+
+
+def month_name(key, year=True):
+    # the name of a month from its number of months since 1970, e.g. 'January 2023' (or just 'January').
+    year_number, month_number = divmod(int(key), 12)
+    return f"{MONTHS[month_number]} {1970 + year_number}" if year else MONTHS[month_number]
+
+
+def month_dates(key):
+    # the first and last day of a month from its number of months since 1970.
+    start = np.datetime64('1970-01', 'M') + int(key)
+    return start.astype('datetime64[D]'), (start + 1).astype('datetime64[D]') - 1
+
+
+def month_names(keys):
+    # the names of the months the data covers, which only include the year when the data covers more than one year.
+    year = len({key // 12 for key in keys}) > 1
+    return {key: month_name(key, year) for key in keys}
+
+
+def period(keys):
+    # the months the data covers as text, e.g. 'January to August 2023' or 'March 2022 to August 2023'.
+    first, last = min(keys), max(keys)
+    if first // 12 == last // 12:
+        return f"{month_name(first, year=False)} to {month_name(last)}"
+    return f"{month_name(first)} to {month_name(last)}"
+
+
+def day_of_week(dates):
+    # the day of the week (monday is 0) from the number of days since 1970-01-01, which was a thursday.
+    return ((dates.to_numpy().astype('datetime64[D]').astype(np.int64) + 3) % 7).astype(np.int8)
+
+
+def hour(hhmm):
+    # the hour of a time stored as HHMM (e.g. 930 is 9:30 and 5 is 0:05), where 2400 is midnight and anything that isn't a valid time (including 2401
+    # to 2459) is -1.
+    hhmm = hhmm.to_numpy()
+    hours, minutes = np.divmod(hhmm, 100)
+    valid = ((hours < 24) | (hhmm == 2400)) & (minutes < 60) & (hhmm >= 0)
+    return np.where(valid, hours % 24, -1).astype(np.int8)
+
+
+def derive(flights):
+    # adding the columns the charts group by, using integer arithmetic on the raw values so that this only happens once when the data is loaded.
+    flights['FL_DATE'] = pd.to_datetime(flights['FL_DATE'])
+    flights['Month'] = month(flights['FL_DATE'])
+    flights['DayOfWeek'] = day_of_week(flights['FL_DATE'])
+    flights['DepHour'] = hour(flights['CRS_DEP_TIME'])
+    flights['ArrHour'] = hour(flights['CRS_ARR_TIME'])
+    # the flight status by departure (which doesn't have diverted flights) and by arrival.
+    flights['DepStatus'] = status.classify(flights, 'DEP_DELAY', diverted=False)
+    flights['ArrStatus'] = status.classify(flights, 'ARR_DELAY')
+    return flights
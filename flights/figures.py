@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+# the most figures that are kept at once, across every page and session of a server process.
+MAX_FIGURES = 512
+
+
+def hashable(value):
+    # widget values such as the airlines picked in a multiselect (a list) or a filter (a dict) turned into something that can be a key.
+    if isinstance(value, dict):
+        return tuple(sorted((key, hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(hashable(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    if hasattr(value, 'token'):
+        # data such as a cube is keyed by its token (a number which no other cube has), so that the cached figures don't keep data which
+        # has been let go in memory.
+        return type(value).__name__, value.token
+    return value
+
+
+class FigureCache:
+    # a least recently used cache of finished figures, keyed by the chart and the values of the widgets it depends on.
+
+    def __init__(self, size=MAX_FIGURES):
+        self.size = size
+        self.figures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        with self.lock:
+            if key in self.figures:
+                self.figures.move_to_end(key)
+                self.hits += 1
+                return self.figures[key]
+        # building the figure outside of the lock so that the other sessions aren't kept waiting for it.
+        figure = build()
+        with self.lock:
+            self.misses += 1
+            self.figures[key] = figure
+            self.figures.move_to_end(key)
+            while len(self.figures) > self.size:
+                self.figures.popitem(last=False)
+        return figure
+
+    def clear(self):
+        with self.lock:
+            self.figures.clear()
+
+
+# the finished figures are kept as plotly figures rather than as their json, since st.plotly_chart serializes a figure itself and parsing the
+# json back into a figure takes about as long as building it. The figures are shared between sessions, so they must never be modified.
+_figures = FigureCache()
+
+
+def chart(name):
+    # a decorator for a function which builds the figure of a chart (named e.g. 'Home: top airports') from the data and the widget values it
+    # depends on, which are its arguments. The figure is only rebuilt when one of them changes, so a rerun only redraws the charts whose
+    # inputs changed. The data (e.g. the cube) is part of the key, so the figures of data which has been reloaded or has changed are never used.
+    def decorator(build):
+        @wraps(build)
+        def cached(*args):
+            return _figures.get((name, *map(hashable, args)), lambda: build(*args))
+        return cached
+    return decorator
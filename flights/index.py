@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+
+class KeyIndex:
+    # the rows of a frame sorted by a few key columns (e.g. airport then airline), with the start and stop row of every key
+    # so that selecting a key is a slice of the rows that match instead of a comparison over all of them.
+
+    def __init__(self, frame, keys):
+        self.keys = list(keys)
+        # a frame which is already sorted (e.g. a mapped cuboid, see flights.mapped) is kept as it is instead of being copied.
+        if pd.MultiIndex.from_frame(frame[self.keys]).is_monotonic_increasing:
+            self.frame = frame.reset_index(drop=True)
+        else:
+            self.frame = frame.sort_values(self.keys, kind='stable', ignore_index=True)
+        self.ranges = {}
+        self.children = {}
+
+        # finding where each key (and each prefix of it, e.g. just the airport) starts and stops in the sorted rows.
+        for depth in range(1, len(self.keys) + 1):
+            values = self.frame[self.keys[:depth]]
+            starts = np.flatnonzero((values != values.shift()).any(axis=1).to_numpy())
+            stops = np.append(starts[1:], len(self.frame))
+            for start, stop, key in zip(starts, stops, values.iloc[starts].itertuples(index=False, name=None)):
+                self.ranges[key] = (start, stop)
+                # also keeping the values under each prefix, e.g. the airlines at each airport.
+                self.children.setdefault(key[:-1], []).append(key[-1])
+
+    def slice(self, *key):
+        # the rows for a key or a prefix of it, which is empty if the key doesn't exist.
+        start, stop = self.ranges.get(tuple(key), (0, 0))
+        return self.frame.iloc[start:stop]
+
+    def values(self, *prefix):
+        # the sorted values of the next key under a prefix, e.g. values() gives the airports and values('ATL') the airlines at ATL.
+        return self.children.get(tuple(prefix), [])
+
+
+class PrefixSums:
+    # the measures of a frame with a date column added up to every date (for every combination of the other columns), so that the sums
+    # over any range of dates are the difference of two rows, which takes the same time for a week as for a year.
+
+    def __init__(self, frame, date, measures):
+        self.measures = list(measures)
+        dims = [column for column in frame.columns if column != date and column not in self.measures]
+        grouped = frame.groupby(dims, observed=True, dropna=False)
+        group = grouped.ngroup().to_numpy()
+        self.groups = grouped.size().index.to_frame(index=False)
+
+        # the sorted dates which have any rows, where a range of dates is found by a binary search.
+        days = frame[date].to_numpy().astype('datetime64[D]')
+        self.dates = np.unique(days)
+        day = np.searchsorted(self.dates, days)
+
+        # a table of sums with a row for every date (after a row of zeros) and a column for every group, added up down the dates.
+        self.sums = {}
+        size = len(self.groups)
+        for measure in self.measures:
+            values = frame[measure].to_numpy()
+            table = np.bincount((day + 1) * size + group, weights=values, minlength=(len(self.dates) + 1) * size)
+            self.sums[measure] = np.cumsum(table.reshape(len(self.dates) + 1, size).astype(values.dtype), axis=0)
+
+    def between(self, start, end):
+        # the sums of every group from the start to the end date (both included), leaving out the groups which have nothing in that range.
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'D'), 'left')
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'D'), 'right')
+        frame = self.groups.copy()
+        for measure in self.measures:
+            frame[measure] = self.sums[measure][hi] - self.sums[measure][lo]
+        return frame[(frame[self.measures] != 0).any(axis=1).to_numpy()].reset_index(drop=True)
@@ -0,0 +1,136 @@
+import argparse
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from flights import cube, schema, store
+from flights.features import derive
+
+# how much more memory a chunk takes while it's being processed (derived columns, masks and groupbys) than the chunk itself.
+OVERHEAD = 4
+
+# the number of rows read first to measure how much memory a row takes.
+SAMPLE_ROWS = 10_000
+
+# the share of the memory budget kept for the aggregates of the chunks read so far, the rest is for the chunk being processed.
+TOTALS_SHARE = 0.25
+
+
+def chunk_rows(csv, memory_mb):
+    # the number of rows per chunk so that processing a chunk stays within its share of the memory budget.
+    sample = store.read_csv(csv, schema.COLUMNS, nrows=SAMPLE_ROWS)
+    row_bytes = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    return max(int(memory_mb * (1 - TOTALS_SHARE) * 2**20 / (row_bytes * OVERHEAD)), 1_000)
+
+
+def size(parts):
+    return sum(cuboid.memory_usage(deep=True).sum() for part in parts for cuboid in part)
+
+
+def compact(totals):
+    # adding up the aggregates of each month's chunks into one, in a single merge per month rather than one per chunk.
+    return {key: [cube.merge(parts) if len(parts) > 1 else parts[0]] for key, parts in totals.items()}
+
+
+def ingest(csv=store.CSV_PATH, memory_mb=512, dataset=None):
+    # streaming the csv in chunks which fit in the memory budget: the flights of each chunk are appended to the parquet file of their month
+    # and their aggregates are kept with those of that month, so that memory depends on the chunk size and the number of airports and
+    # airlines, not on the number of flights. The aggregates of a month's chunks are only added up when the month is written, or when
+    # they outgrow their share of the memory budget, so each chunk isn't merged into the totals again for every chunk after it. Every
+    # month is written to its own partition of the store and of the cube.
+    # With `dataset`, the csv (e.g. a monthly extract) is appended to the store and cube of that dataset's csv instead: only the months
+    # in the csv are written, replacing them if they were already there, and the other months are left as they are.
+    target = dataset or csv
+    recover(store.store_path(target))
+    recover(store.cube_path(target))
+    if os.path.isfile(store.store_path(target)):
+        if dataset:
+            raise ValueError(f"{store.store_path(target)} isn't split into months, ingest {target} again before appending to it")
+        # the store from before it was split into months.
+        os.remove(store.store_path(target))
+    if dataset and os.path.isdir(store.cube_path(target)) and not store.partitions(store.cube_path(target)):
+        raise ValueError(f"{store.cube_path(target)} isn't split into months, ingest {target} again before appending to it")
+    rows = chunk_rows(csv, memory_mb)
+    writers = {}
+    totals = {}
+    # the bytes of aggregates that are kept before they're added up, which doubles when adding them up doesn't bring them under it
+    # (e.g. with many months), so that merging stays linear in the number of chunks.
+    limit = memory_mb * TOTALS_SHARE * 2**20
+    kept = 0
+    try:
+        for chunk in store.read_csv(csv, schema.COLUMNS, chunksize=rows):
+            chunk = derive(schema.compact(chunk))
+            for key, month in chunk.groupby('Month'):
+                writer = writers.get(key)
+                table = pa.Table.from_pandas(month[schema.COLUMNS], schema=writer.schema if writer else None, preserve_index=False)
+                if not writer:
+                    os.makedirs(store.store_path(target), exist_ok=True)
+                    writer = writers[key] = pq.ParquetWriter(store.month_path(store.store_path(target), key) + '.tmp', table.schema)
+                writer.write_table(table)
+                part = cube.cuboids(month)
+                totals.setdefault(key, []).append(part)
+                kept += size([part])
+            if kept > limit:
+                totals = compact(totals)
+                kept = size(parts[0] for parts in totals.values())
+                limit = max(limit, 2 * kept)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    totals = {key: parts[0] for key, parts in compact(totals).items()}
+
+    if dataset is None:
+        # a full ingest replaces every month, so the months which are no longer in the csv (and any cube which wasn't split into months) go.
+        for key in store.partitions(store.store_path(target)):
+            if key not in totals:
+                remove(store.month_path(store.store_path(target), key))
+        remove(store.cube_path(target))
+    for key, cuboids in totals.items():
+        path = store.month_path(store.store_path(target), key)
+        os.replace(path + '.tmp', path)
+        # saving the month's aggregates next to its old ones and then swapping them, so that the app never loads half of a month. The old
+        # folder is moved aside before the new one is moved in (folders can't be replaced in one step), and only removed after, so that
+        # the month is only missing between two renames.
+        path = os.path.join(store.cube_path(target), store.partition(key))
+        cube.Cube(cuboids).save(path + '.tmp')
+        if os.path.exists(path):
+            remove(path + '.old')
+            os.replace(path, path + '.old')
+        os.replace(path + '.tmp', path)
+        remove(path + '.old')
+    return rows, sorted(totals)
+
+
+def recover(path):
+    # cleaning up after an ingest which stopped part way: a month which was moved aside but not replaced is moved back, and the rest of
+    # the leftovers are removed. The app never reads them either way, since their names aren't months (see store.partitions).
+    if not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        month, extension = os.path.splitext(name)
+        if extension == '.old' and not os.path.exists(os.path.join(path, month)):
+            os.replace(os.path.join(path, name), os.path.join(path, month))
+        elif extension in ('.old', '.tmp'):
+            remove(os.path.join(path, name))
+
+
+def remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the flights csv into a parquet store and precomputed aggregates, one chunk at a time.")
+    parser.add_argument("csv", nargs="?", default=store.CSV_PATH)
+    parser.add_argument("--memory-mb", type=int, default=512, help="Memory budget for processing a chunk of the csv (default: 512).")
+    parser.add_argument("--append-to", metavar="DATASET", help="Append the months in the csv to the store and aggregates of this dataset's csv, "
+                                                                "replacing those months if they are already there.")
+    args = parser.parse_args()
+    rows, months = ingest(args.csv, args.memory_mb, args.append_to)
+    target = args.append_to or args.csv
+    print(f"Wrote {len(months)} month(s) ({', '.join(map(store.partition, months))}) to {store.store_path(target)} and "
+          f"{store.cube_path(target)} in chunks of {rows:,} rows")
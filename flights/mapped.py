@@ -0,0 +1,94 @@
+import argparse
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from flights import store
+from flights.cube import Cube, dimensions
+from flights.features import derive
+
+
+def mapped_path(csv):
+    # the prepared flights (compact types plus the derived columns) are written next to the csv as an arrow file, e.g. data/flights_sample_3m.arrow.
+    return os.path.splitext(csv)[0] + ".arrow"
+
+
+def cube_path(csv):
+    # the aggregates are written next to the saved ones as a folder with an arrow file for every cuboid, e.g. data/flights_sample_3m.cube.arrow.
+    return store.cube_path(csv) + ".arrow"
+
+
+def fresh(path, csv):
+    # whether a mapped file (or folder) was written since the data last changed: the csv, or the store and aggregates written (or appended
+    # to) by flights.ingest. A stale one is skipped, so the app never shows older data than it would without it.
+    sources = [source for source in (csv, store.store_path(csv), store.cube_path(csv)) if os.path.exists(source)]
+    return os.path.exists(path) and all(os.stat(path).st_mtime_ns >= os.stat(source).st_mtime_ns for source in sources)
+
+
+def write(flights, path):
+    # writing the flights as a single uncompressed record batch, which is laid out on disk exactly like it is in memory.
+    # Missing floats are kept as NaN values instead of arrow nulls, since a column with nulls can't be viewed as a numpy array without a copy.
+    table = pa.table({column: pa.array(flights[column], from_pandas=flights[column].dtype.kind != 'f') for column in flights.columns})
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(len(table), 1))
+    # replacing the file in one step so that a process which is reading the old one keeps its mapping of it.
+    os.replace(tmp, path)
+    return path
+
+
+def write_cube(cube, path):
+    # writing every cuboid of a cube as it is kept in memory (sorted by its index), through a temporary folder which is swapped in at the end.
+    os.makedirs(path + ".tmp", exist_ok=True)
+    for cuboid in cube.cuboids:
+        write(cuboid, os.path.join(path + ".tmp", '-'.join(dimensions(cuboid)) + ".arrow"))
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def prepare(csv=store.CSV_PATH, path=None):
+    # one time preparation of the flights and their aggregates for every server process, so that none of them have to parse, derive or
+    # add up anything.
+    flights = derive(store.load(csv))
+    cube = Cube.load(store.cube_path(csv)) if os.path.isdir(store.cube_path(csv)) else Cube.build(flights)
+    return write(flights, path or mapped_path(csv)), write_cube(cube, cube_path(csv))
+
+
+def view(column):
+    # a numpy array (or a categorical over one) which points straight into the mapped file, falling back to a copy for columns that can't be
+    # viewed (e.g. strings or columns with nulls).
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    try:
+        if pa.types.is_dictionary(array.type):
+            if array.null_count:
+                raise pa.ArrowInvalid("codes with nulls")
+            return pd.Categorical.from_codes(array.indices.to_numpy(), categories=array.dictionary.to_pandas(), validate=False)
+        return array.to_numpy(zero_copy_only=True)
+    except (pa.ArrowInvalid, NotImplementedError):
+        return column.to_pandas().to_numpy()
+
+
+def read(path):
+    # mapping the file read-only and building the dataframe from views of it, so that the operating system keeps one copy of the pages in
+    # memory which every process on the host shares, and opening it takes milliseconds. The columns can't be written to (copy on write
+    # makes any change take a private copy first).
+    table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return pd.DataFrame({name: view(column) for name, column in zip(table.column_names, table.columns)}, copy=False)
+
+
+def read_cube(path):
+    # the cube from the mapped cuboids, whose measures are shared by every process like the flights. Only what the cube builds from them
+    # (the running totals by day, and the codes which are kept as strings) takes memory in each process.
+    return Cube([read(os.path.join(path, name)) for name in sorted(os.listdir(path)) if name.endswith(".arrow")])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the prepared flights and their aggregates to memory mapped arrow files which every app process shares.")
+    parser.add_argument("csv", nargs="?", default=store.CSV_PATH)
+    args = parser.parse_args()
+    print("Wrote {} and {}".format(*prepare(args.csv)))
@@ -0,0 +1,123 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from flights import status, store
+from flights.cube import Cube
+
+# the airport column each page is filtered by, and the columns of its hourly counts and flight statuses.
+VIEWS = {'departures': ('ORIGIN', 'DepHour', 'DepStatus'), 'arrivals': ('DEST', 'ArrHour', 'ArrStatus')}
+
+# the hours (-1 is for flights without a valid time) and the status codes that every view has a count for.
+HOURS = np.arange(-1, 24)
+STATUSES = np.arange(status.UNKNOWN + 1)
+
+# the delay cause measures of every view, for each of the delay types.
+CAUSES = ['CauseFlights', 'CauseMinutes', 'CauseReported']
+
+
+def views_path(csv):
+    # the lookup file lives next to the csv, e.g. data/flights_sample_3m.views.npz.
+    return os.path.splitext(csv)[0] + ".views.npz"
+
+
+def load_views(csv):
+    # the views of a csv when `python -m flights.prewarm` has written them since the data last changed (the aggregates written by
+    # flights.ingest, or otherwise the csv), or None.
+    path, cube_path = views_path(csv), store.cube_path(csv)
+    source = cube_path if os.path.isdir(cube_path) else csv
+    if os.path.exists(path) and os.stat(path).st_mtime_ns >= os.stat(source).st_mtime_ns:
+        return Views.load(path)
+    return None
+
+
+def materialize(name, counts, causes):
+    # the hourly counts, status counts and delay causes of every airport and airline pair in a part of a view's cuboids, as one row per pair.
+    airport, hour, code = VIEWS[name]
+    pairs = pd.MultiIndex.from_frame(counts[[airport, 'AIRLINE']].drop_duplicates().sort_values([airport, 'AIRLINE']))
+    arrays = {
+        'airports': pairs.get_level_values(0).to_numpy(dtype=str),
+        'airlines': pairs.get_level_values(1).to_numpy(dtype=str),
+        'hours': counts.groupby([airport, 'AIRLINE', hour])['Flights'].sum().unstack(hour).reindex(index=pairs, columns=HOURS, fill_value=0),
+        'statuses': counts.groupby([airport, 'AIRLINE', code])['Flights'].sum().unstack(code).reindex(index=pairs, columns=STATUSES, fill_value=0),
+    }
+    sums = causes.groupby([airport, 'AIRLINE', 'Cause'], observed=True)[CAUSES].sum().unstack('Cause')
+    for measure in CAUSES:
+        arrays[measure] = sums[measure].reindex(index=pairs, columns=store.DELAY_TYPES.values(), fill_value=0)
+    return {key: np.asarray(value) for key, value in arrays.items()}
+
+
+def empty():
+    arrays = {'airports': np.array([], dtype=str), 'airlines': np.array([], dtype=str),
+              'hours': np.zeros((0, len(HOURS)), dtype=np.int64), 'statuses': np.zeros((0, len(STATUSES)), dtype=np.int64)}
+    arrays.update({measure: np.zeros((0, len(store.DELAY_TYPES))) for measure in CAUSES})
+    return arrays
+
+
+def prewarm(csv=store.CSV_PATH, workers=None):
+    # computing what the departures and arrivals pages show for every airport and airline pair, with the airports split between a pool of
+    # processes, and saving it all to one lookup file which the pages read instead of querying the cube.
+    cube = Cube.open(csv)
+    workers = workers or os.cpu_count()
+    arrays = {}
+    with ProcessPoolExecutor(workers) as pool:
+        for name, (airport, hour, code) in VIEWS.items():
+            counts = cube.cuboids[cube.cuboid(['Flights', airport, 'AIRLINE', hour, code])]
+            causes = cube.cuboids[cube.cuboid(CAUSES + [airport, 'AIRLINE', 'Cause'])]
+            # a few parts for every process so that a part with the busiest airports doesn't hold up the rest.
+            parts = [airports for airports in np.array_split(np.array(sorted(counts[airport].unique())), workers * 4) if len(airports)]
+            futures = [pool.submit(materialize, name, counts[counts[airport].isin(airports)], causes[causes[airport].isin(airports)])
+                       for airports in parts]
+            # the arrays of a view without any airports (e.g. of an empty extract), which every query looks up and then answers from the cube.
+            results = [future.result() for future in futures] or [empty()]
+            for key in results[0]:
+                arrays[f'{name}_{key}'] = np.concatenate([result[key] for result in results])
+    path = views_path(csv)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(path + '.tmp', path)
+    return path, sum(len(arrays[f'{name}_airports']) for name in VIEWS)
+
+
+class Views:
+    # the precomputed results of the departures and arrivals pages, answering the queries those pages make of the cube for a single airport
+    # and airline with a lookup of the pair's row.
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.rows = {name: {pair: row for row, pair in enumerate(zip(arrays[f'{name}_airports'], arrays[f'{name}_airlines']))} for name in VIEWS}
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls({key: f[key] for key in f.files})
+
+    def query(self, measure, by, where):
+        # the same result as Cube.query, or None when the query isn't one of the pages' (the cube answers it instead).
+        for name, (airport, hour, code) in VIEWS.items():
+            if set(where) != {airport, 'AIRLINE'} or len(by) != 1 or any(isinstance(value, (list, tuple, set)) for value in where.values()):
+                continue
+            row = self.rows[name].get((where[airport], where['AIRLINE']))
+            if row is None:
+                return None
+            if measure == 'Flights' and by[0] in (hour, code):
+                # like the cube, only the hours and statuses which have flights.
+                values = pd.Series(self.arrays[f'{name}_{"hours" if by[0] == hour else "statuses"}'][row], name=measure,
+                                   index=pd.Index(HOURS if by[0] == hour else STATUSES, name=by[0]))
+                return values[values > 0]
+            if measure in CAUSES and by[0] == 'Cause':
+                return pd.Series(self.arrays[f'{name}_{measure}'][row], name=measure,
+                                 index=pd.Index(store.DELAY_TYPES.values(), name='Cause'))
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the departures and arrivals pages for every airport and airline, using every core.")
+    parser.add_argument("csv", nargs="?", default=store.CSV_PATH)
+    parser.add_argument("--workers", type=int, help="Number of processes (default: the number of cores).")
+    args = parser.parse_args()
+    path, pairs = prewarm(args.csv, args.workers)
+    print(f"Wrote {path} with {pairs:,} airport and airline pairs")
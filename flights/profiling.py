@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+
+import streamlit as st
+
+# profiling is turned on for every session with FLIGHTS_PROFILE=1, or for one session by adding ?profile=1 to the url.
+ENV = 'FLIGHTS_PROFILE'
+
+# every profiled rerun is appended to this file as one json line.
+LOG_PATH = os.environ.get('FLIGHTS_PROFILE_LOG', 'profile.jsonl')
+
+# streamlit runs each session's script in its own thread, so the profiler of the current rerun is kept per thread.
+_local = threading.local()
+_lock = threading.Lock()
+
+# tracemalloc slows down every allocation of the process, so it's only tracing while a profiler is running: the first one starts it and the
+# last one to finish stops it (unless it was already tracing, e.g. with python -X tracemalloc). Since the memory it traces is that of the
+# whole process, the bytes of a section also count what other sessions allocated at the same time, so they're only exact for one session.
+_profilers = 0
+_started = False
+
+
+def trace():
+    global _profilers, _started
+    with _lock:
+        if _profilers == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started = True
+        _profilers += 1
+
+
+def untrace():
+    global _profilers, _started
+    with _lock:
+        _profilers -= 1
+        if _profilers == 0 and _started:
+            tracemalloc.stop()
+            _started = False
+
+
+def enabled():
+    if os.environ.get(ENV, '').lower() in ('1', 'true', 'yes'):
+        return True
+    try:
+        return st.query_params.get('profile', '').lower() in ('1', 'true', 'yes')
+    except Exception:
+        return False
+
+
+def scanned(rows):
+    # called by the code doing the work (e.g. the cube) to count the rows it went through in the current section.
+    profiler = getattr(_local, 'profiler', None)
+    if profiler:
+        profiler.rows += rows
+
+
+class Profiler:
+    # times the sections of a page between calls to mark(), along with the rows scanned and the memory allocated in each of them.
+
+    def __init__(self, page):
+        self.page = page
+        self.sections = []
+        self.rows = 0
+        # tracing stops when the profiler finishes, or when it's let go without finishing (e.g. a page which stopped early).
+        trace()
+        self.untrace = weakref.finalize(self, untrace)
+        tracemalloc.reset_peak()
+        self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = self.last = time.perf_counter()
+        _local.profiler = self
+
+    def mark(self, section):
+        # ending the current section, which covers everything since the previous mark.
+        now = time.perf_counter()
+        current, peak = tracemalloc.get_traced_memory()
+        self.sections.append({'section': section, 'seconds': round(now - self.last, 6), 'rows': self.rows,
+                              'bytes': max(peak - self.memory, 0)})
+        tracemalloc.reset_peak()
+        self.memory = current
+        self.rows = 0
+        self.last = time.perf_counter()
+
+    def finish(self):
+        # showing the sections in a panel in the sidebar and adding them to the log.
+        _local.profiler = None
+        self.untrace()
+        total = time.perf_counter() - self.start
+        record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'page': self.page, 'seconds': round(total, 6), 'sections': self.sections}
+        with _lock, open(LOG_PATH, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+        with st.sidebar.expander("Profiling", expanded=True):
+            st.write(f"**{self.page}** rerun took {total * 1000:,.1f} ms")
+            st.dataframe([{'Section': s['section'], 'ms': round(s['seconds'] * 1000, 2), 'Rows scanned': s['rows'],
+                           'KB allocated': round(s['bytes'] / 1024, 1)} for s in self.sections],
+                         hide_index=True, use_container_width=True)
+
+
+class _Disabled:
+    # what start() returns when profiling is off, so that the pages can call mark() and finish() either way.
+
+    def mark(self, section):
+        pass
+
+    def finish(self):
+        pass
+
+
+def start(page):
+    # starting to profile a rerun of a page, at the top of the page.
+    return Profiler(page) if enabled() else _Disabled()
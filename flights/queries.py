@@ -0,0 +1,55 @@
+from flights import sketch, status
+from flights.features import DAYS
+from flights.store import DELAY_TYPES
+
+# the queries the charts and tables of the pages are made from, which the query service (flights.api) answers with as well, so that both
+# always show the same numbers. Each one takes the cube (or the cube of a range of dates) and the airport and airline the page selected.
+
+# the statuses of the flight status chart on the home page, which (unlike the departures and arrivals pages) shows the diverted flights.
+HOME_STATUSES = {status.DELAYED: 'Delayed', status.DIVERTED: 'Diverted', status.CANCELLED: 'Cancelled', status.ON_TIME: 'On-time'}
+
+
+def days(cube):
+    # the flights on each day of the week, by the name of the day.
+    return cube.query('Flights', by=['DayOfWeek']).rename(lambda day: DAYS[day])
+
+
+def top(cube, column, n=10):
+    # the airports or airlines with the most flights.
+    return cube.query('Flights', by=[column]).nlargest(n)
+
+
+def delayed_airports(cube, reason, n=5):
+    # the arrival airports with the most flights delayed by a reason (late aircraft delays count all of the delayed flights).
+    measure = 'DelayedFlights' if reason == 'Late Aircraft Delay' else 'CauseFlights'
+    delayed = cube.query(measure, by=['DEST'], Cause=reason)
+    return delayed[delayed > 0].sort_values(ascending=False).head(n)
+
+
+def statuses(cube, code, labels=status.LABELS, **selection):
+    # the flights with each status, by the name of the status.
+    return status.distribution(cube.query('Flights', by=[code], **selection), labels)
+
+
+def hours(cube, hour, **selection):
+    # the flights in each hour of the day, including the hours without any.
+    return cube.query('Flights', by=[hour], **selection).reindex(range(24), fill_value=0)
+
+
+def causes(cube, month=None, **selection):
+    # the flights delayed by each delay type, and the average of their delays (which is missing when none of them were reported), in all
+    # of the months or in one (as the number of months since 1970).
+    if month is not None:
+        selection['Month'] = month
+    flights = cube.query('CauseFlights', by=['Cause'], **selection).reindex(DELAY_TYPES.values(), fill_value=0)
+    average = cube.mean('CauseMinutes', 'CauseReported', by=['Cause'], **selection).reindex(DELAY_TYPES.values())
+    return flights, average
+
+
+def percentiles(cube, month=None, **selection):
+    # the average and the percentiles of the delays of each delay type, from the sketches of the delay minutes, in all of the months or in one.
+    if month is not None:
+        selection['Month'] = month
+    table = sketch.percentiles(cube.query('DelayCount', by=['Cause', 'Bucket'], **selection))
+    table.insert(0, 'Average', cube.mean('CauseMinutes', 'CauseReported', by=['Cause'], **selection))
+    return table.reindex(DELAY_TYPES.values())
@@ -0,0 +1,160 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from flights import features, status, store
+
+# the columns of a planned flight the risk of a delay is estimated from. Every flight is counted by each of them on its own (a marginal), and
+# the month is kept as months since 1970 in the cube (so that months can be appended) and folded into the month of the year by the model.
+FACTORS = ['AIRLINE', 'ORIGIN', 'DEST', 'DepHour', 'DayOfWeek', 'Month']
+
+# the measures of the marginals: the flights, the flights which arrived late or were cancelled, and the total and number of arrival delays.
+MEASURES = ['RiskFlights', 'RiskDelayed', 'RiskCancelled', 'RiskMinutes', 'RiskReported']
+
+# how many flights of the average flight each value's own flights are blended with, so that a value with only a few flights (e.g. a small
+# airport) stays close to the average instead of being certain to be delayed.
+PRIOR = 50
+
+# the columns of a schedule of planned flights, in the same format as the flight data.
+SCHEDULE_COLUMNS = ['FL_DATE', 'AIRLINE', 'ORIGIN', 'DEST', 'CRS_DEP_TIME']
+
+# the tokens of the models (see Cube.token).
+_tokens = itertools.count()
+
+
+def marginals(flights):
+    # a cuboid for each factor with the measures summed over its values, from one block of all of the measures.
+    delays = flights['ARR_DELAY'].to_numpy(dtype=np.float64)
+    reported = ~np.isnan(delays)
+    measures = pd.DataFrame(np.column_stack([np.ones(len(flights)), flights['ArrStatus'].to_numpy() == status.DELAYED,
+                                             flights['CANCELLED'].to_numpy() == 1, np.where(reported, delays, 0), reported]), columns=MEASURES)
+    cuboids = []
+    for factor in FACTORS:
+        cuboid = measures.groupby(flights[factor].to_numpy(), dropna=False).sum().rename_axis(factor).reset_index()
+        counts = ['RiskFlights', 'RiskDelayed', 'RiskCancelled', 'RiskReported']
+        cuboid[counts] = cuboid[counts].astype(np.int64)
+        cuboids.append(cuboid)
+    return cuboids
+
+
+def logit(p):
+    return np.log(p / (1 - p))
+
+
+def lookup(values, column):
+    # the row of each value of a column in an index of values (or -1 when it isn't there). Only the distinct values are looked up (the
+    # categories of a categorical), which is much quicker than looking up every string of a long schedule.
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes, uniques = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, uniques = pd.factorize(column)
+    return np.append(values.get_indexer(uniques), -1)[codes]
+
+
+def read_schedule(csv):
+    # a schedule of planned flights from a csv (a path or an uploaded file), and which of its flights can be scored: the ones with a valid
+    # date and departure time. Raises a ValueError naming the columns the csv doesn't have.
+    schedule = pd.read_csv(csv, usecols=lambda column: column in SCHEDULE_COLUMNS, dtype={**store.DTYPES, 'CRS_DEP_TIME': 'object'})
+    missing = [column for column in SCHEDULE_COLUMNS if column not in schedule]
+    if missing:
+        raise ValueError(f"The schedule doesn't have the {', '.join(missing)} column{'s' if len(missing) > 1 else ''}")
+    schedule = schedule[SCHEDULE_COLUMNS]
+    # a date or time which can't be read is left missing instead of failing the whole schedule.
+    schedule['FL_DATE'] = pd.to_datetime(schedule['FL_DATE'], errors='coerce')
+    schedule['CRS_DEP_TIME'] = pd.to_numeric(schedule['CRS_DEP_TIME'], errors='coerce')
+    return schedule, (schedule['FL_DATE'].notna() & schedule['CRS_DEP_TIME'].notna()).to_numpy()
+
+
+def planned(schedule):
+    # the factors of planned flights with a date (FL_DATE) and a scheduled departure time as HHMM (CRS_DEP_TIME), like the rows of the csv.
+    dates = pd.to_datetime(schedule['FL_DATE'])
+    return {
+        'AIRLINE': schedule['AIRLINE'],
+        'ORIGIN': schedule['ORIGIN'],
+        'DEST': schedule['DEST'],
+        'DepHour': features.hour(schedule['CRS_DEP_TIME']),
+        'DayOfWeek': features.day_of_week(dates),
+        'Month': features.month(dates) % 12,
+    }
+
+
+class Model:
+    # the empirical chance of a flight arriving late or being cancelled, and its expected arrival delay, for every value of each factor in
+    # dense arrays. A flight is scored by looking up the row of each of its values and adding them up: the chances as log odds against the
+    # average flight (like naive bayes) and the delay as minutes more or less than the average. The last row of every array is for values
+    # which aren't in the data (e.g. a new airport), and adds nothing.
+
+    def __init__(self, base, values, weights):
+        self.base = base
+        self.values = values
+        self.weights = weights
+        # what the figure cache keys the figures of the model by (like the cube's).
+        self.token = next(_tokens)
+
+    @classmethod
+    def build(cls, cube):
+        tables = {factor: cube.query(MEASURES, by=[factor]) for factor in FACTORS}
+        tables['Month'] = tables['Month'].groupby(tables['Month'].index % 12).sum()
+        totals = tables['AIRLINE'].sum()
+        base = {
+            'delayed': totals['RiskDelayed'] / totals['RiskFlights'],
+            'cancelled': totals['RiskCancelled'] / totals['RiskFlights'],
+            'minutes': totals['RiskMinutes'] / max(totals['RiskReported'], 1),
+        }
+        values, weights = {}, {}
+        for factor, table in tables.items():
+            table = table[table.index.notna()]
+            delayed = (table['RiskDelayed'] + PRIOR * base['delayed']) / (table['RiskFlights'] + PRIOR)
+            cancelled = (table['RiskCancelled'] + PRIOR * base['cancelled']) / (table['RiskFlights'] + PRIOR)
+            minutes = (table['RiskMinutes'] + PRIOR * base['minutes']) / (table['RiskReported'] + PRIOR)
+            values[factor] = pd.Index(table.index)
+            weights[factor] = {
+                'delayed': np.append(logit(delayed.to_numpy()) - logit(base['delayed']), 0),
+                'cancelled': np.append(logit(cancelled.to_numpy()) - logit(base['cancelled']), 0),
+                'minutes': np.append(minutes.to_numpy() - base['minutes'], 0),
+            }
+        return cls(base, values, weights)
+
+    def contributions(self, schedule):
+        # the row of every factor's arrays for each planned flight, and what each factor adds to its log odds and minutes.
+        rows = {}
+        for factor, column in planned(schedule).items():
+            row = lookup(self.values[factor], column)
+            rows[factor] = np.where(row < 0, len(self.values[factor]), row)
+        return {target: {factor: self.weights[factor][target][row] for factor, row in rows.items()} for target in self.base}
+
+    def score(self, schedule):
+        # scoring a whole schedule of planned flights at once with a lookup and a sum per factor.
+        contributions = self.contributions(schedule)
+        delayed = logit(self.base['delayed']) + sum(contributions['delayed'].values())
+        cancelled = logit(self.base['cancelled']) + sum(contributions['cancelled'].values())
+        return pd.DataFrame({
+            'DelayProbability': 1 / (1 + np.exp(-delayed)),
+            'CancelProbability': 1 / (1 + np.exp(-cancelled)),
+            'ExpectedDelay': self.base['minutes'] + sum(contributions['minutes'].values()),
+        }, index=schedule.index)
+
+
+if __name__ == "__main__":
+    from flights.cube import Cube
+
+    parser = argparse.ArgumentParser(description="Score a schedule of planned flights (a csv with the columns of the flights) for the risk of delays.")
+    parser.add_argument("schedule")
+    parser.add_argument("--csv", default=store.CSV_PATH, help="The flights the risk is estimated from.")
+    parser.add_argument("--output", help="Where to write the scores (default: print the first rows).")
+    args = parser.parse_args()
+
+    model = Model.build(Cube.open(args.csv))
+    schedule, scorable = read_schedule(args.schedule)
+    start = time.perf_counter()
+    scores = model.score(schedule[scorable])
+    print(f"Scored {scorable.sum():,} flights in {time.perf_counter() - start:.3f}s")
+    if not scorable.all():
+        print(f"Left out {(~scorable).sum():,} flights without a valid FL_DATE or CRS_DEP_TIME")
+    if args.output:
+        pd.concat([schedule, scores], axis=1).to_csv(args.output, index=False)
+    else:
+        print(pd.concat([schedule, scores], axis=1).head(10).to_string())
@@ -0,0 +1,67 @@
+import heapq
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from flights import status
+from flights.store import DELAY_TYPES
+
+# the coordinates of the airports for the route map come from the airportsdata package, and the map is left out when it isn't installed.
+try:
+    import airportsdata
+except ImportError:
+    airportsdata = None
+
+# the columns a route is made of, and the dimensions of the route table.
+ROUTE = ['ORIGIN', 'DEST']
+DIMENSIONS = [*ROUTE, 'AIRLINE', 'Month']
+
+# the measures of the route table: the flights, the flights which arrived late, and the total and number of reported minutes of each delay cause.
+MINUTES = {cause: f'{cause} Minutes' for cause in DELAY_TYPES.values()}
+REPORTED = {cause: f'{cause} Reported' for cause in DELAY_TYPES.values()}
+MEASURES = ['RouteFlights', 'RouteDelayed', *MINUTES.values(), *REPORTED.values()]
+
+
+def table(flights):
+    # the route table with a row for every route, airline and month, counted in one groupby over a block of all of the measures.
+    minutes = flights[list(DELAY_TYPES)].to_numpy(dtype=np.float64)
+    reported = ~np.isnan(minutes)
+    measures = pd.DataFrame(np.hstack([np.ones((len(flights), 1)), (flights['ArrStatus'].to_numpy() == status.DELAYED)[:, None],
+                                       np.where(reported, minutes, 0), reported]), columns=MEASURES)
+    routes = measures.groupby([flights[column].to_numpy() for column in DIMENSIONS], dropna=False).sum()
+    routes = routes.rename_axis(DIMENSIONS).reset_index()
+    counts = ['RouteFlights', 'RouteDelayed', *REPORTED.values()]
+    routes[counts] = routes[counts].astype(np.int64)
+    return routes
+
+
+def summary(routes):
+    # the share of delayed flights and the average minutes of each delay cause for every route (the rows of a table summed by route).
+    routes = routes.reset_index()
+    routes.insert(0, 'Route', routes['ORIGIN'] + ' → ' + routes['DEST'])
+    routes['DelayRate'] = routes['RouteDelayed'] / routes['RouteFlights']
+    for cause in DELAY_TYPES.values():
+        routes[f'Average {cause}'] = routes[MINUTES[cause]] / routes[REPORTED[cause]].replace(0, np.nan)
+    return routes
+
+
+def top(routes, k, column, min_flights=0):
+    # the k routes with the largest values of a column (e.g. the busiest or the most delayed), using a heap of k rows instead of sorting all
+    # of them. Routes with fewer than min_flights flights are left out so that a route with a single late flight isn't the most delayed.
+    values = routes[column].to_numpy()
+    candidates = np.flatnonzero(routes['RouteFlights'].to_numpy() >= min_flights)
+    return routes.iloc[heapq.nlargest(k, candidates, key=values.__getitem__)]
+
+
+@lru_cache(maxsize=1)
+def airports():
+    return airportsdata.load('IATA')
+
+
+def coordinates(codes):
+    # the latitude and longitude of each airport (by its code) which has a known location, or None without the airportsdata package.
+    if airportsdata is None:
+        return None
+    known = airports()
+    return {code: (known[code]['lat'], known[code]['lon']) for code in codes if code in known}
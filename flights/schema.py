@@ -0,0 +1,54 @@
+import argparse
+
+import pandas as pd
+
+# the compact in memory types of the columns the pages read. Codes are categoricals, flags are int8, and minutes are float32 since they can be
+# missing. Any column which isn't here is dropped when the data is loaded.
+SCHEMA = {
+    'FL_DATE': 'datetime64[ns]',
+    'AIRLINE': 'category',
+    'ORIGIN': 'category',
+    'DEST': 'category',
+    'FL_NUMBER': 'int16',
+    'CRS_DEP_TIME': 'int16',
+    'CRS_ARR_TIME': 'int16',
+    'DEP_DELAY': 'float32',
+    'ARR_DELAY': 'float32',
+    'CANCELLED': 'int8',
+    'DIVERTED': 'int8',
+    'DELAY_DUE_CARRIER': 'float32',
+    'DELAY_DUE_WEATHER': 'float32',
+    'DELAY_DUE_NAS': 'float32',
+    'DELAY_DUE_SECURITY': 'float32',
+    'DELAY_DUE_LATE_AIRCRAFT': 'float32',
+}
+COLUMNS = list(SCHEMA)
+
+
+def compact(flights):
+    # keeping only the columns in the schema and converting them to their compact types.
+    columns = [column for column in SCHEMA if column in flights]
+    return flights[columns].astype({column: SCHEMA[column] for column in columns})
+
+
+def memory_report(flights):
+    # the memory taken by each column (including the strings of object and categorical columns), largest first.
+    usage = flights.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({'dtype': flights.dtypes.astype(str), 'bytes': usage, 'bytes per row': usage / max(len(flights), 1)})
+    report = report.sort_values('bytes', ascending=False)
+    report.loc['total'] = ['', report['bytes'].sum(), report['bytes per row'].sum()]
+    return report
+
+
+if __name__ == "__main__":
+    from flights import store
+
+    parser = argparse.ArgumentParser(description="Compare the memory taken by the csv with default types and with the compact schema.")
+    parser.add_argument("csv", nargs="?", default=store.CSV_PATH)
+    args = parser.parse_args()
+
+    flights = pd.read_csv(args.csv)
+    print(f"All columns with the default types ({len(flights):,} rows):")
+    print(memory_report(flights).to_string(float_format='{:,.1f}'.format))
+    print("\nThe columns the pages read with the compact schema:")
+    print(memory_report(compact(store.read_csv(args.csv, COLUMNS))).to_string(float_format='{:,.1f}'.format))
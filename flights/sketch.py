@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from flights.store import DELAY_TYPES
+
+# the delay minutes of each cause are counted in buckets whose bounds grow by a constant factor, so that any percentile computed from the
+# bucket counts is within 2% of the true value (like a DDSketch). Adding the counts of two sketches up gives the sketch of both, so the
+# sketches of every airport, airline and month can be summed for any filter like the other measures of the cube.
+RELATIVE_ERROR = 0.02
+GAMMA = (1 + RELATIVE_ERROR) / (1 - RELATIVE_ERROR)
+
+# delays of zero minutes have their own bucket, below all of the others.
+ZERO = np.iinfo(np.int16).min
+
+# the percentiles shown on the pages.
+PERCENTILES = {'Median': 0.5, '90th Percentile': 0.9, '99th Percentile': 0.99}
+
+
+def bucket(minutes):
+    # the bucket of each delay, where bucket k holds the delays between GAMMA^(k-1) and GAMMA^k minutes.
+    minutes = np.asarray(minutes, dtype=np.float64)
+    positive = minutes > 0
+    buckets = np.full(minutes.shape, ZERO, dtype=np.int16)
+    buckets[positive] = np.ceil(np.log(minutes[positive]) / np.log(GAMMA))
+    return buckets
+
+
+def value(buckets):
+    # the delay each bucket stands for, which is within RELATIVE_ERROR of every delay in the bucket.
+    buckets = np.asarray(buckets)
+    return np.where(buckets == ZERO, 0.0, 2 * GAMMA ** buckets.astype(np.float64) / (GAMMA + 1))
+
+
+def sketches(flights, airport, delay, dims=('AIRLINE', 'Month')):
+    # the number of reported delays of each cause in each bucket for the flights that were delayed, for every airport and combination of
+    # the dimensions (the same flights the averages of the delay causes are over).
+    delayed = flights[flights[delay] > 0]
+    minutes = delayed[list(DELAY_TYPES)].to_numpy(dtype=np.float64)
+    rows, causes = np.nonzero(~np.isnan(minutes))
+    keys = [delayed[column].to_numpy()[rows] for column in [airport, *dims]]
+    cause = pd.Categorical.from_codes(causes, categories=list(DELAY_TYPES.values()))
+    counts = pd.Series(1, index=rows).groupby([*keys, cause, bucket(minutes[rows, causes])], observed=True, dropna=False).size()
+    cuboid = counts.rename('DelayCount').rename_axis([airport, *dims, 'Cause', 'Bucket']).reset_index()
+    cuboid['Cause'] = pd.Categorical(cuboid['Cause'], categories=DELAY_TYPES.values())
+    return cuboid
+
+
+def percentiles(counts, percentiles=PERCENTILES):
+    # the percentiles of each cause from the counts of its sketch (a series indexed by cause and bucket, e.g. summed from the cube for a
+    # filter), taking the bucket of the nearest rank.
+    result = {}
+    for cause, cause_counts in counts.groupby(level='Cause', observed=True):
+        cause_counts = cause_counts.droplevel('Cause').sort_index()
+        ranks = np.cumsum(cause_counts.to_numpy())
+        if not len(ranks) or ranks[-1] == 0:
+            continue
+        positions = np.searchsorted(ranks, [q * ranks[-1] for q in percentiles.values()], side='left')
+        result[cause] = value(cause_counts.index.to_numpy()[positions])
+    return pd.DataFrame.from_dict(result, orient='index', columns=list(percentiles)).rename_axis('Cause')
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+# the status codes of a flight, which are stored in the DepStatus and ArrStatus columns.
+ON_TIME, DELAYED, CANCELLED, DIVERTED, UNKNOWN = range(5)
+
+# the names of the statuses shown on the departure and arrival pages.
+LABELS = {CANCELLED: 'Cancelled', DELAYED: 'Delayed', ON_TIME: 'On time'}
+
+
+def classify(flights, delay, diverted=True):
+    # giving every flight one status in a single pass, where cancelled (and diverted, for arrivals) flights come first since they have no delay,
+    # and the rest are delayed if they left or arrived late and on time otherwise. Flights without a delay are unknown.
+    conditions = [flights['CANCELLED'] == 1, flights[delay] > 0, flights[delay] <= 0]
+    codes = [CANCELLED, DELAYED, ON_TIME]
+    if diverted:
+        conditions.insert(1, flights['DIVERTED'] == 1)
+        codes.insert(1, DIVERTED)
+    return np.select(conditions, codes, default=UNKNOWN).astype(np.int8)
+
+
+def distribution(counts, labels=LABELS):
+    # turning the flight counts by status code into counts by status name, for the statuses in labels (in that order).
+    return pd.Series({name: int(counts[code]) if code in counts else 0 for code, name in labels.items()})
@@ -0,0 +1,113 @@
+import argparse
+import os
+import re
+import shutil
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from flights import features, schema
+
+# path to the original csv from kaggle and the columnar copy of it that gets written next to it.
+CSV_PATH = "data/flights_sample_3m.csv"
+
+# explicit dtypes for every column in the csv so that pandas doesn't have to guess them (and so that the csv and the parquet file always give back the same types).
+DTYPES = {
+    'AIRLINE': 'object', 'AIRLINE_DOT': 'object', 'AIRLINE_CODE': 'object', 'DOT_CODE': 'int64',
+    'FL_NUMBER': 'int64', 'ORIGIN': 'object', 'ORIGIN_CITY': 'object', 'DEST': 'object', 'DEST_CITY': 'object',
+    'CRS_DEP_TIME': 'int64', 'DEP_TIME': 'float64', 'DEP_DELAY': 'float64', 'TAXI_OUT': 'float64',
+    'WHEELS_OFF': 'float64', 'WHEELS_ON': 'float64', 'TAXI_IN': 'float64', 'CRS_ARR_TIME': 'int64',
+    'ARR_TIME': 'float64', 'ARR_DELAY': 'float64', 'CANCELLED': 'float64', 'CANCELLATION_CODE': 'object',
+    'DIVERTED': 'float64', 'CRS_ELAPSED_TIME': 'float64', 'ELAPSED_TIME': 'float64', 'AIR_TIME': 'float64',
+    'DISTANCE': 'float64', 'DELAY_DUE_CARRIER': 'float64', 'DELAY_DUE_WEATHER': 'float64',
+    'DELAY_DUE_NAS': 'float64', 'DELAY_DUE_SECURITY': 'float64', 'DELAY_DUE_LATE_AIRCRAFT': 'float64',
+}
+DATE_COLUMNS = ['FL_DATE']
+
+# readable names of the delay columns which are used as labels in the charts.
+DELAY_TYPES = {'DELAY_DUE_CARRIER': 'Carrier Delay', 'DELAY_DUE_WEATHER': 'Weather Delay',
+               'DELAY_DUE_NAS': 'NAS Delay', 'DELAY_DUE_SECURITY': 'Security Delay',
+               'DELAY_DUE_LATE_AIRCRAFT': 'Late Aircraft Delay'}
+
+
+def store_path(csv):
+    # the columnar store lives next to the csv with the same name, e.g. data/flights_sample_3m.parquet, which is a folder with a parquet
+    # file for each month of flights (e.g. 2023-01.parquet) so that a month can be added or replaced without rewriting the others.
+    return os.path.splitext(csv)[0] + ".parquet"
+
+
+def partition(key):
+    # the name of the partition for a month (as the number of months since 1970), e.g. 2023-01.
+    year, month = divmod(int(key), 12)
+    return f"{1970 + year}-{month + 1:02d}"
+
+
+def partition_key(name):
+    # the month of a partition from its name, e.g. 636 for 2023-01.
+    year, month = name.split('-')
+    return (int(year) - 1970) * 12 + int(month) - 1
+
+
+def partitions(path):
+    # the months which have a partition in a folder, from the names of their files or folders.
+    # Anything else in the folder (e.g. a temporary file which is still being written) is skipped.
+    if not os.path.isdir(path):
+        return []
+    return sorted(partition_key(name[:7]) for name in os.listdir(path) if re.fullmatch(r'\d{4}-\d{2}(\.parquet)?', name))
+
+
+def month_path(path, key):
+    # the parquet file of a month in the store.
+    return os.path.join(path, partition(key) + ".parquet")
+
+
+def write_month(flights, path, key):
+    # writing the flights of one month to its partition, through a temporary file so that a reader never sees half of it.
+    os.makedirs(path, exist_ok=True)
+    target = month_path(path, key)
+    flights.to_parquet(target + ".tmp", index=False)
+    os.replace(target + ".tmp", target)
+
+
+def cube_path(csv):
+    # the precomputed aggregates of the data are saved in a folder next to the csv, e.g. data/flights_sample_3m.cube.
+    return os.path.splitext(csv)[0] + ".cube"
+
+
+def read_csv(csv, columns=None, **kwargs):
+    # only the dtypes of the columns that are actually being read are passed on (any other arguments, e.g. chunksize, go to pd.read_csv).
+    dtypes = DTYPES if columns is None else {c: DTYPES[c] for c in columns if c in DTYPES}
+    dates = DATE_COLUMNS if columns is None else [c for c in DATE_COLUMNS if c in columns]
+    return pd.read_csv(csv, usecols=columns, dtype=dtypes, parse_dates=dates, **kwargs)
+
+
+def convert(csv=CSV_PATH, store=None):
+    # one time conversion of the csv into parquet with the compact schema, which is what load() reads from afterwards.
+    store = store or store_path(csv)
+    flights = schema.compact(read_csv(csv, schema.COLUMNS))
+    if os.path.isfile(store):
+        os.remove(store)
+    shutil.rmtree(store, ignore_errors=True)
+    for key, month in flights.groupby(features.month(flights['FL_DATE'])):
+        write_month(month, store, key)
+    return store
+
+
+def load(csv=CSV_PATH, columns=schema.COLUMNS):
+    # reading only the requested columns from the parquet store, and falling back to the csv if it hasn't been converted yet.
+    # Either way the columns have the compact types of the schema. All of the monthly partitions are read (temporary files being written aren't).
+    store = store_path(csv)
+    if os.path.isdir(store):
+        files = [month_path(store, key) for key in partitions(store)]
+        # reading the files as one dataset, which gives the categoricals of all of the months the same categories.
+        return pq.ParquetDataset(files).read(columns=columns).to_pandas()
+    if os.path.exists(store):
+        return pd.read_parquet(store, columns=columns)
+    return schema.compact(read_csv(csv, columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the flights csv into a columnar parquet store with the compact schema.")
+    parser.add_argument("csv", nargs="?", default=CSV_PATH)
+    args = parser.parse_args()
+    print(f"Wrote {convert(args.csv)}")
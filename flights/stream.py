@@ -0,0 +1,409 @@
+import argparse
+import io
+import os
+import queue
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from flights import schema, sketch, store
+from flights.cube import CAUSE_MEASURES, DATE, Cube
+from flights.features import derive
+
+# the cuboids which are kept for the flights in each window, as (dimensions, measures), with the same columns as those of the cube so that
+# every chart of the home, departures and arrivals pages can be answered from a window. The first measure of each is a count of flights,
+# and a cell is dropped when it goes back to zero.
+CUBOIDS = [
+    (['Month', 'AIRLINE'], ['Flights']),
+    ([DATE, 'DayOfWeek', 'ArrStatus'], ['Flights']),
+    ([DATE, 'ORIGIN'], ['Flights']),
+    ([DATE, 'AIRLINE'], ['Flights']),
+    (['DEST', DATE, 'Cause'], ['DelayedFlights', 'CauseFlights']),
+    (['ORIGIN', 'AIRLINE', 'DepHour', 'DepStatus'], ['Flights']),
+    (['DEST', 'AIRLINE', 'ArrHour', 'ArrStatus'], ['Flights']),
+    (['ORIGIN', 'AIRLINE', 'Cause'], CAUSE_MEASURES),
+    (['DEST', 'AIRLINE', 'Cause'], CAUSE_MEASURES),
+    (['ORIGIN', 'AIRLINE', 'Cause', 'Bucket'], ['DelayCount']),
+    (['DEST', 'AIRLINE', 'Cause', 'Bucket'], ['DelayCount']),
+]
+
+# the rolling windows as (minutes, minutes in each slot): the last hour by the minute and the last day by the hour. Month to date is kept
+# apart, since it only starts over when a new month starts.
+WINDOWS = {'Last Hour': (60, 1), 'Last Day': (1440, 60)}
+MONTH_TO_DATE = 'Month to Date'
+
+# where the app reads the stream from: a file which is followed as lines are added to it, or host:port of a server from `python -m flights.stream`.
+ENV = 'FLIGHTS_STREAM'
+
+# the columns of the csv which are read from the stream.
+COLUMNS = schema.COLUMNS
+
+# the seconds to wait before opening a source again after it ended or failed, which doubles every time it fails without sending a line.
+BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+def tables():
+    return [{} for _ in CUBOIDS]
+
+
+def add(totals, cells, sign=1):
+    # adding (or taking away) the measures of cells to a set of tables, which is a constant number of dict operations for each cell.
+    for i, key, values in cells:
+        table = totals[i]
+        cell = table.get(key)
+        if cell is None:
+            table[key] = list(values) if sign == 1 else [-value for value in values]
+        elif len(values) == 1:
+            cell[0] += sign * values[0]
+            if cell[0] == 0:
+                del table[key]
+        else:
+            for j, value in enumerate(values):
+                cell[j] += sign * value
+            if cell[0] == 0:
+                del table[key]
+
+
+def subtract(totals, slot):
+    add(totals, [(i, key, values) for i, table in enumerate(slot) for key, values in table.items()], -1)
+
+
+class Window:
+    # the totals of the flights in the last `span` minutes, with a ring of slots which each have the flights of `slot` minutes. A flight is
+    # added to its slot and to the totals, and when the time moves on, the slots which fall out of the window are taken away from the totals
+    # (so every flight is added and taken away once). Flights from before the window are left out.
+
+    def __init__(self, span, slot):
+        self.slot = slot
+        self.slots = [tables() for _ in range(span // slot)]
+        self.totals = tables()
+        self.current = None
+
+    def add(self, minute, cells):
+        number = minute // self.slot
+        if self.current is None:
+            self.current = number
+        if number > self.current:
+            self.advance(number)
+        elif number <= self.current - len(self.slots):
+            return
+        slot = self.slots[number % len(self.slots)]
+        add(slot, cells)
+        add(self.totals, cells)
+
+    def advance(self, number):
+        # emptying the slots which are reused for the new times, at most once each.
+        for expired in range(max(self.current + 1, number - len(self.slots) + 1), number + 1):
+            slot = self.slots[expired % len(self.slots)]
+            subtract(self.totals, slot)
+            for table in slot:
+                table.clear()
+        self.current = number
+
+
+class MonthWindow:
+    # the totals of the flights since the start of the latest month, which start over when the first flight of a new month comes in.
+
+    def __init__(self):
+        self.month = None
+        self.totals = tables()
+
+    def add(self, month, cells):
+        if self.month is None or month > self.month:
+            self.month = month
+            self.totals = tables()
+        if month == self.month:
+            add(self.totals, cells)
+
+
+def cells(flights):
+    # the cells of every cuboid which each flight adds to, as (cuboid, key, measures). The columns are turned into lists first, since
+    # taking python values out of them one at a time is much quicker than out of arrays.
+    columns = [flights[column].to_numpy().tolist() for column in ['Month', 'AIRLINE', 'ORIGIN', 'DEST', 'DayOfWeek', 'DepHour', 'DepStatus',
+                                                                  'ArrHour', 'ArrStatus', 'DEP_DELAY', 'ARR_DELAY']]
+    days = flights[DATE].to_numpy().astype('datetime64[D]').astype(np.int64).tolist()
+    minutes = flights[list(store.DELAY_TYPES)].to_numpy(dtype=np.float64)
+    buckets = sketch.bucket(minutes).tolist()
+    causes = list(enumerate(store.DELAY_TYPES.values()))
+    for (month, airline, origin, dest, day_of_week, dep_hour, dep_status, arr_hour, arr_status, dep_delay, arr_delay), day, delays, bucket in zip(
+            zip(*columns), days, minutes.tolist(), buckets):
+        flight = [
+            (0, (month, airline), (1,)),
+            (1, (day, day_of_week, arr_status), (1,)),
+            (2, (day, origin), (1,)),
+            (3, (day, airline), (1,)),
+            (5, (origin, airline, dep_hour, dep_status), (1,)),
+            (6, (dest, airline, arr_hour, arr_status), (1,)),
+        ]
+        if arr_delay > 0 or dep_delay > 0:
+            for c, cause in causes:
+                delay = delays[c]
+                # a missing delay is nan, which is the only value that isn't equal to itself.
+                reported = delay == delay
+                measures = (1, int(reported and delay > 0), delay if reported else 0.0, int(reported))
+                if arr_delay > 0:
+                    flight.append((4, (dest, day, cause), measures[:2]))
+                    flight.append((8, (dest, airline, cause), measures))
+                    if reported:
+                        flight.append((10, (dest, airline, cause, bucket[c]), (1,)))
+                if dep_delay > 0:
+                    flight.append((7, (origin, airline, cause), measures))
+                    if reported:
+                        flight.append((9, (origin, airline, cause, bucket[c]), (1,)))
+        yield flight
+
+
+def event_minutes(flights):
+    # the time of each flight (its scheduled departure) in minutes since 1970, which is what the windows move on by.
+    days = flights[DATE].to_numpy().astype('datetime64[D]').astype(np.int64)
+    hours, minutes = np.divmod(flights['CRS_DEP_TIME'].to_numpy().astype(np.int64), 100)
+    return days * 1440 + np.clip(hours, 0, 24) * 60 + np.clip(minutes, 0, 59)
+
+
+def frames(totals):
+    # the tables of a window as cuboids.
+    cuboids = []
+    for (dims, measures), table in zip(CUBOIDS, totals):
+        cuboid = pd.DataFrame(list(table.keys()), columns=dims) if table else pd.DataFrame(columns=dims)
+        cuboid[measures] = pd.DataFrame(list(table.values()), columns=measures) if table else pd.DataFrame(columns=measures)
+        if DATE in dims:
+            cuboid[DATE] = pd.to_datetime(cuboid[DATE].astype(np.int64), unit='D')
+        if 'Cause' in dims:
+            cuboid['Cause'] = pd.Categorical(cuboid['Cause'], categories=store.DELAY_TYPES.values())
+        counts = [measure for measure in measures if measure != 'CauseMinutes']
+        cuboid[counts] = cuboid[counts].astype(np.int64)
+        cuboids.append(cuboid)
+    return cuboids
+
+
+class Stream:
+    # the rolling windows of a stream of flights. Flights are added by one thread (see consume()) while the pages read the windows as cubes.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = {name: Window(span, slot) for name, (span, slot) in WINDOWS.items()}
+        self.month = MonthWindow()
+        self.events = 0
+        self.clock = None
+        self.version = 0
+        self.cubes = {}
+        # what the stream is doing (shown in the sidebar), and the lines which were skipped since they couldn't be read as flights.
+        self.state = 'Connecting'
+        self.skipped = 0
+
+    def add(self, flights):
+        # adding a batch of flights (with the columns of the csv and the derived ones) to every window. The cells are worked out before
+        # any of them are added, so a batch which fails is left out as a whole.
+        minutes = event_minutes(flights)
+        months = flights['Month'].to_numpy()
+        flights_cells = list(cells(flights))
+        with self.lock:
+            for minute, month, flight in zip(minutes, months, flights_cells):
+                for window in self.windows.values():
+                    window.add(minute, flight)
+                self.month.add(month, flight)
+            self.events += len(flights)
+            if len(flights):
+                latest = np.datetime64(int(minutes.max()), 'm')
+                self.clock = latest if self.clock is None else max(self.clock, latest)
+            self.version += 1
+
+    def names(self):
+        return [*self.windows, MONTH_TO_DATE]
+
+    def cube(self, name):
+        # the flights in a window as a cube (or None while it has none), which is only built again after new flights were added.
+        with self.lock:
+            if self.cubes.get(name, (None,))[0] != self.version:
+                totals = self.month.totals if name == MONTH_TO_DATE else self.windows[name].totals
+                self.cubes[name] = (self.version, Cube(frames(totals)) if totals[0] else None)
+            return self.cubes[name][1]
+
+    def consume(self, lines, batch=1000, interval=1.0):
+        # reading flights from lines of csv (the first one being the header), and adding them in batches of up to `batch` flights or every
+        # `interval` seconds, whichever comes first. The lines are read by another thread, so that a batch is added on time even while
+        # the source has nothing new. Returns the number of lines read, or raises the error the source failed with once they're added.
+        received = queue.Queue(batch * 10)
+        threading.Thread(target=read, args=(lines, received), daemon=True).start()
+        header, failure, count = received.get(), None, 0
+        if isinstance(header, Exception):
+            failure, header = header, received.get()
+        pending, flushed, done = [], time.monotonic(), header is None
+        if not done:
+            self.state = 'Receiving'
+        while not done:
+            try:
+                line = received.get(timeout=max(interval - (time.monotonic() - flushed), 0.01))
+                done = line is None
+                if isinstance(line, Exception):
+                    failure = line
+                elif not done:
+                    pending.append(line)
+                    count += 1
+            except queue.Empty:
+                pass
+            if pending and (len(pending) >= batch or done or time.monotonic() - flushed >= interval):
+                self.add_lines(header, pending)
+                pending = []
+            if not pending:
+                flushed = time.monotonic()
+        if failure is not None:
+            raise failure
+        return count
+
+    def add_lines(self, header, lines):
+        # adding a batch of lines, where a batch with a line that can't be read is read again in smaller parts so only the bad lines are skipped.
+        try:
+            flights = parse(header, lines)
+        except Exception:
+            good, bad = readable(header, lines)
+            for line, error in bad:
+                print(f"Skipped a line of the stream ({error}): {line.strip()}", file=sys.stderr)
+            self.skipped += len(bad)
+            if not good:
+                return
+            flights, lines = parse(header, good), good
+        try:
+            self.add(flights)
+        except Exception as error:
+            print(f"Skipped {len(lines):,} flights of the stream since they couldn't be added: {error}", file=sys.stderr)
+            self.skipped += len(lines)
+            return
+        self.state = 'Receiving'
+
+    def run(self, source):
+        # consuming a source for as long as the app runs, opening it again whenever it ends or fails (e.g. a file which doesn't exist yet
+        # or a dropped connection), after a wait which grows while it keeps failing.
+        backoff = BACKOFF
+        while True:
+            try:
+                if self.consume(open_source(source)):
+                    backoff = BACKOFF
+                problem = 'the stream ended'
+            except Exception as error:
+                problem = f"{type(error).__name__}: {error}"
+            print(f"Opening {source} again in {backoff:g}s since {problem}", file=sys.stderr)
+            self.state = f"Reconnecting in {backoff:g}s ({problem})"
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            self.state = 'Connecting'
+
+
+def read(lines, received):
+    # putting the lines of a source on a queue, followed by the error it failed with (if it did) and None when it ends.
+    try:
+        for line in lines:
+            received.put(line)
+    except Exception as error:
+        received.put(error)
+    finally:
+        received.put(None)
+
+
+def readable(header, lines):
+    # the lines which can be read as flights and the ones which can't (with their errors), found by reading the halves of a part with a
+    # bad line until the bad lines are on their own, which takes a few reads for every bad line instead of one for every line.
+    try:
+        parse(header, lines)
+        return lines, []
+    except Exception as error:
+        if len(lines) == 1:
+            return [], [(lines[0], error)]
+        middle = len(lines) // 2
+        first, second = readable(header, lines[:middle]), readable(header, lines[middle:])
+        return first[0] + second[0], first[1] + second[1]
+
+
+def parse(header, lines):
+    flights = store.read_csv(io.StringIO(header + ''.join(lines)), [column for column in COLUMNS if column in header.strip().split(',')])
+    return derive(schema.compact(flights))
+
+
+def follow(path, poll=0.5):
+    # the lines of a file, including the ones added to it later (like tail -f).
+    with open(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if line.endswith(b'\n'):
+                yield line.decode()
+            elif line:
+                # a line which is still being written.
+                f.seek(f.tell() - len(line))
+                time.sleep(poll)
+            else:
+                time.sleep(poll)
+
+
+def receive(address):
+    # the lines sent by a server from `python -m flights.stream`.
+    host, port = address.rsplit(':', 1)
+    with socket.create_connection((host, int(port))) as connection, connection.makefile('r') as f:
+        yield from f
+
+
+def open_source(source):
+    if re.fullmatch(r'[\w.-]+:\d+', source) and not os.path.exists(source):
+        return receive(source)
+    return follow(source)
+
+
+def start(source):
+    # a stream which is fed from a source by a background thread.
+    stream = Stream()
+    threading.Thread(target=stream.run, args=(source,), daemon=True).start()
+    return stream
+
+
+def replay(csv, rate):
+    # the lines of a csv in the order of the flights' scheduled departures, `rate` flights a second.
+    flights = store.read_csv(csv, schema.COLUMNS)
+    flights = flights.sort_values(['FL_DATE', 'CRS_DEP_TIME'], kind='stable')
+    flights['FL_DATE'] = flights['FL_DATE'].dt.strftime('%Y-%m-%d')
+    yield ','.join(flights.columns) + '\n'
+    started = time.monotonic()
+    for i in range(0, len(flights), 100):
+        # sleeping until the flights of this block are due, since a sleep for every flight would limit the rate.
+        delay = started + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield flights.iloc[i:i + 100].to_csv(index=False, header=False)
+
+
+class ReplayHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            for lines in replay(self.server.csv, self.server.rate):
+                self.wfile.write(lines.encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the flights of a csv as a stream, in the order of their departures, to a socket or a file.")
+    parser.add_argument("csv", nargs="?", default=store.CSV_PATH)
+    parser.add_argument("--rate", type=float, default=100, help="Flights a second (default: 100).")
+    parser.add_argument("--port", type=int, default=8503, help="Serve the stream to every client which connects (default: 8503).")
+    parser.add_argument("--output", help="Append the stream to this file instead.")
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            for lines in replay(args.csv, args.rate):
+                # a header is only written to a new file.
+                if f.tell() and lines.startswith('FL_DATE,'):
+                    continue
+                f.write(lines)
+                f.flush()
+    else:
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', args.port), ReplayHandler)
+        server.daemon_threads = True
+        server.csv, server.rate = args.csv, args.rate
+        print(f"Replaying {args.csv} at {args.rate:g} flights a second on 127.0.0.1:{args.port} (set {ENV}=127.0.0.1:{args.port} for the app)")
+        server.serve_forever()
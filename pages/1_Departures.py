@@ -1,14 +1,17 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import base64
 import plotly.graph_objects as go
+from flights import data, figures, profiling, queries
 
 st.set_page_config(
     page_title="Departure Analysis",
     page_icon='✈️'
     )
 
+# timing each section of the page when profiling is turned on (with ?profile=1 in the url or FLIGHTS_PROFILE=1).
+profile = profiling.start('Departures')
+
 # reading the gif file as binary data and then encoding it as a base64, and storing the result as a string.
 with open("data/take-off.gif", "rb") as f:
     gif_data = f.read()
@@ -29,20 +32,18 @@ st.markdown("<hr style='border: 1px solid #f0f0f0;'>", unsafe_allow_html=True)
 
 st.write("On this page, you will gain more insights into departure patterns and airline performance at various airports and airlines. Explore the busiest departure times, track flight status distributions, and delve into the average delay times caused by different delay types.")
 
-# added cache to ensure that the data doesn't have to be reloaded everytime the file runs.
-@st.cache_data
-def load_data(csv):
-    return pd.read_csv(csv)
-
-# reading the csv.
-flights_data = load_data("data/flights_sample_3m.csv")
+# getting the precomputed aggregates of the flight data which are built once and shared by all the pages, every chart below is answered from these.
+cube = data.load_cube("data/flights_sample_3m.csv")
+# or those of the last hour, day or month of the live flight stream instead, when it's turned on in the sidebar.
+cube = data.live(cube)
+profile.mark('load')
 
 
 st.header("Filter Flight Data by Airlines and Departure Airport")
 # CREATING THE SELECT BOXES ONE FOR AIRPORT AND THEN ANOTHER WHICH FILTERS BASED ON THAT 
-selected_airport_dep = st.selectbox('Select Departure Airport', sorted(flights_data['ORIGIN'].unique()))
-filtered_airlines = flights_data[flights_data['ORIGIN'] == selected_airport_dep]['AIRLINE'].unique()
-selected_airline_dep = st.selectbox('Select Airline', sorted(filtered_airlines))
+selected_airport_dep = st.selectbox('Select Departure Airport', cube.values('ORIGIN'))
+filtered_airlines = cube.values('AIRLINE', ORIGIN=selected_airport_dep)
+selected_airline_dep = st.selectbox('Select Airline', filtered_airlines)
 st.markdown("<b>*Note: </b> This selection will be used to filter all the charts below.",unsafe_allow_html=True)
 
 
@@ -50,84 +51,82 @@ st.markdown("<b>*Note: </b> This selection will be used to filter all the charts
 # BUSIEST DEPARTURE TIMES
 st.subheader(f'Busiest Departure Times at {selected_airport_dep} with {selected_airline_dep}')
 
-# converting departure time to datetime forma and then extracting hour from departure time.
-flights_data['CRS_DEP_TIME'] = pd.to_datetime(flights_data['CRS_DEP_TIME'], format='%H%M', errors='coerce')
-flights_data['DepHour'] = flights_data['CRS_DEP_TIME'].dt.hour
+# each chart is built by a function of the selected airport and airline, and is only rebuilt when one of them changes (otherwise the
+# finished figure is reused from the figure cache).
+@figures.chart('Departures: busiest hours')
+def busiest_hours_chart(cube, selected_airport_dep, selected_airline_dep):
+    # filtering data based on user's selected airport and airline.
+    selection = {'ORIGIN': selected_airport_dep, 'AIRLINE': selected_airline_dep}
 
-# filtering data based on user's selected airport and airline.
-filtered_data_dep = flights_data[(flights_data['ORIGIN'] == selected_airport_dep) & (flights_data['AIRLINE'] == selected_airline_dep)]
+    # counting occurrences of each departure hour, for all of the hours.
+    departure_counts = queries.hours(cube, 'DepHour', **selection)
 
-# counting occurrences of each departure hour.
-departure_counts = filtered_data_dep['DepHour'].value_counts().sort_index()
+    # setting the hours to display in AM/PM.
+    hours = [(f'{h % 12 if h % 12 != 0 else 12} {"AM" if h < 12 else "PM"}') for h in range(24)]
 
-# setting the hours and initializing departure counts for all hours.
-hours = [(f'{h % 12 if h % 12 != 0 else 12} {"AM" if h < 12 else "PM"}') for h in range(24)]
-count_all_hours = {hour: 0 for hour in range(24)}
+    # plotting, formatting x-axis to display in AM/PM and adding a tool tip.
+    fig1 = px.bar(x=hours, y=departure_counts.to_list(),
+                  labels={'x': 'Departure Hour', 'y': 'Number of Flights'},
+                  title=f'Busiest Departure Times from {selected_airport_dep} with {selected_airline_dep}')
+    fig1.update_xaxes(tickmode='array')
+    fig1.update_traces(hovertemplate='<b>Departure Hour:</b> %{x}<br><b>Number of Flights:</b> %{y}<extra></extra>', marker_color='#048092')
+    return fig1
 
-# counting occurrences of each departure hours.
-for hour, count in departure_counts.items():
-    count_all_hours[hour] = count
 
-# plotting, formatting x-axis to display in AM/PM and adding a tool tip.
-fig1 = px.bar(x=hours, y=[count_all_hours[hour] for hour in range(24)],
-              labels={'x': 'Departure Hour', 'y': 'Number of Flights'},
-              title=f'Busiest Departure Times from {selected_airport_dep} with {selected_airline_dep}')
-fig1.update_xaxes(tickmode='array')
-fig1.update_traces(hovertemplate='<b>Departure Hour:</b> %{x}<br><b>Number of Flights:</b> %{y}<extra></extra>', marker_color='#048092')
+fig1 = busiest_hours_chart(cube, selected_airport_dep, selected_airline_dep)
+profile.mark('busiest hours: figure')
 st.plotly_chart(fig1)
+profile.mark('busiest hours: render')
 
 
 
 # FLIGTH STATUS AND DELAYS TYPE DISTRIBUTION DUNUT CHART
 st.subheader("Flight Status Distribution")
 
-# calculating flight count for cancelled, delayed and or diverted flights.
-flight_status_counts = {"Cancelled": filtered_data_dep['CANCELLED'].sum(),
-    "Delayed": filtered_data_dep[filtered_data_dep['DEP_DELAY'] > 0].shape[0],
-    "On time": filtered_data_dep[(filtered_data_dep['CANCELLED'] == 0) & (filtered_data_dep['DEP_DELAY'] <= 0)].shape[0]
-}
+st.write(f"The donut chart below shows the percent of flights departing from {selected_airport_dep} airport on {selected_airline_dep} that were on time, or experienced delays and/or cancellations.")
 
-# setting color based on the flight status.
-colors = {'Delayed': '#83C9FF', 'Cancelled': '#FF2B2B', 'On time': '#0068C9'}
 
-st.write(f"The donut chart below shows the percent of flights departing from {selected_airport_dep} airport on {selected_airline_dep} that were on time, or experienced delays and/or cancellations.")
+@figures.chart('Departures: flight status')
+def flight_status_chart(cube, selected_airport_dep, selected_airline_dep):
+    # the counts are kept along with the figure since they also decide whether the delay types are shown.
+    selection = {'ORIGIN': selected_airport_dep, 'AIRLINE': selected_airline_dep}
 
-# making the donut chart with flight overall status and adding a tooltip.
-fig3 = go.Figure()
-fig3.add_trace(go.Pie(
-    labels=list(flight_status_counts.keys()),
-    values=list(flight_status_counts.values()),
-    textinfo='label+percent', 
-    hole=0.5,
-    hovertemplate='<b>Flight Status:</b> %{label}<br>' + '<b>Value:</b> %{value}<br>' + '<b>Percent of Total:</b> %{percent}',
-    marker=dict(colors= [colors[key] for key in flight_status_counts.keys()])))
-fig3.update_layout(
-    title_text="Flight Status Distribution")
-st.plotly_chart(fig3, use_container_width=True, center=True)
+    # calculating flight count for cancelled, delayed and or diverted flights.
+    flight_status_counts = queries.statuses(cube, 'DepStatus', **selection).to_dict()
 
+    # setting color based on the flight status.
+    colors = {'Delayed': '#83C9FF', 'Cancelled': '#FF2B2B', 'On time': '#0068C9'}
 
+    # making the donut chart with flight overall status and adding a tooltip.
+    fig3 = go.Figure()
+    fig3.add_trace(go.Pie(
+        labels=list(flight_status_counts.keys()),
+        values=list(flight_status_counts.values()),
+        textinfo='label+percent', 
+        hole=0.5,
+        hovertemplate='<b>Flight Status:</b> %{label}<br>' + '<b>Value:</b> %{value}<br>' + '<b>Percent of Total:</b> %{percent}',
+        marker=dict(colors= [colors[key] for key in flight_status_counts.keys()])))
+    fig3.update_layout(
+        title_text="Flight Status Distribution")
+    return flight_status_counts, fig3
 
-# setting it so that if no flights were delayed, it prints my defined staement and if they were, then the second donut chart is printed.
-if flight_status_counts["Delayed"] == 0:
-    st.write("*No flights were delayed thus further analysis on delay distribution is not applicable.*")
 
-else:
-    # renaming my columns so that I can use it later to make sure its easy for my users.
-    filtered_data_dep.rename(columns={'DELAY_DUE_CARRIER': 'Carrier Delay','DELAY_DUE_WEATHER': 'Weather Delay',
-                              'DELAY_DUE_NAS': 'NAS Delay','DELAY_DUE_SECURITY': 'Security Delay',
-                              'DELAY_DUE_LATE_AIRCRAFT': 'Late Aircraft Delay'}, inplace=True)
+flight_status_counts, fig3 = flight_status_chart(cube, selected_airport_dep, selected_airline_dep)
+profile.mark('flight status: figure')
+st.plotly_chart(fig3, use_container_width=True, center=True)
+profile.mark('flight status: render')
+
 
-    st.subheader("Average Dalay caused by Each Delay Type")
-    st.write(f"The donut chart below shows the the percent of flights departing from {selected_airport_dep} airport on {selected_airline_dep} that experienced delays due to specific delay types. Hover over the chart to view the average delay time (in minutes) caused by each delay type.")  
+
+@figures.chart('Departures: delay types')
+def delay_types_chart(cube, selected_airport_dep, selected_airline_dep):
+    selection = {'ORIGIN': selected_airport_dep, 'AIRLINE': selected_airline_dep}
 
     fig4 = go.Figure()
-    
-    # filtering and then counting the data which includes only rows where departure delay is positive since if its negaitve it suggets that it was early/ on time.
-    pos_delay = filtered_data_dep[filtered_data_dep['DEP_DELAY'] > 0]
-    delay_counts = pos_delay[['Carrier Delay', 'Weather Delay', 'NAS Delay', 'Security Delay', 'Late Aircraft Delay']].apply(lambda x: (x > 0).sum())
 
+    # filtering and then counting the data which includes only rows where departure delay is positive since if its negaitve it suggets that it was early/ on time.
     # calculating average delay times for each delay category just to add that to my tool tip. 
-    avg_delay_times = pos_delay[['Carrier Delay', 'Weather Delay', 'NAS Delay', 'Security Delay', 'Late Aircraft Delay']].mean()
+    delay_counts, avg_delay_times = queries.causes(cube, **selection)
 
     # setting color based on the delay type.
     colors = {'Carrier Delay': '#FF2B2B', 'Weather Delay': '#7DEFA1', 'NAS Delay': '#29B09D','Security Delay':'#483C32', 'Late Aircraft Delay':'#FF8700'}
@@ -142,4 +141,31 @@ else:
         marker=dict(colors= [colors[key] for key in delay_counts.keys()])))
     fig4.update_layout(
         title_text="Average Delay Times by Delay Type")
-    st.plotly_chart(fig4, use_container_width=True, center=True) 
\ No newline at end of file
+    return fig4
+
+
+# setting it so that if no flights were delayed, it prints my defined staement and if they were, then the second donut chart is printed.
+if flight_status_counts["Delayed"] == 0:
+    st.write("*No flights were delayed thus further analysis on delay distribution is not applicable.*")
+
+else:
+    st.subheader("Average Dalay caused by Each Delay Type")
+    st.write(f"The donut chart below shows the the percent of flights departing from {selected_airport_dep} airport on {selected_airline_dep} that experienced delays due to specific delay types. Hover over the chart to view the average delay time (in minutes) caused by each delay type.")  
+
+    fig4 = delay_types_chart(cube, selected_airport_dep, selected_airline_dep)
+    profile.mark('delay types: figure')
+    st.plotly_chart(fig4, use_container_width=True, center=True) 
+    profile.mark('delay types: render')
+
+    st.subheader("Delay Percentiles by Delay Type")
+    st.write(f"The table below shows how long the delays of flights departing from {selected_airport_dep} airport on {selected_airline_dep} were for each delay type: the average, the median, and the delay that 90% and 99% of them were shorter than (in minutes). The percentiles are estimated to within 2%.")
+
+    # the percentiles come from the sketches of the delay minutes in the cube, which are added up for the selected airport and airline.
+    selection = {'ORIGIN': selected_airport_dep, 'AIRLINE': selected_airline_dep}
+    delay_percentiles = queries.percentiles(cube, **selection).rename_axis('Delay Type')
+    st.dataframe(delay_percentiles, column_config={column: st.column_config.NumberColumn(format='%.1f') for column in delay_percentiles.columns})
+    profile.mark('delay percentiles')
+
+
+
+profile.finish()
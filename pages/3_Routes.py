@@ -0,0 +1,178 @@
+import streamlit as st
+import plotly.express as px
+import base64
+import plotly.graph_objects as go
+from flights import data, figures, profiling, routes
+
+st.set_page_config(
+    page_title="Route Analysis",
+    page_icon='✈️'
+    )
+
+# timing each section of the page when profiling is turned on (with ?profile=1 in the url or FLIGHTS_PROFILE=1).
+profile = profiling.start('Routes')
+
+# reading the gif file as binary data and then encoding it as a base64, and storing the result as a string.
+with open("data/airport.gif", "rb") as f:
+    gif_data = f.read()
+gif = base64.b64encode(gif_data).decode()
+
+# creating a centrerd layout with the gif and tile being in the same line and there being 10 pixels of space between the gif and title.
+st.markdown(
+    f"""
+    <div style="display: flex; justify-content: center; align-items: center;">
+        <img src="data:image/gif;base64,{gif}" alt="gif" width="100">
+        <h1 style="margin-left: 10px;"> Route Analysis</h1>
+    </div>
+    """,
+    unsafe_allow_html=True
+)
+# making a gray horizontal line under my title for a visual division.
+st.markdown("<hr style='border: 1px solid #f0f0f0;'>", unsafe_allow_html=True)
+
+st.write("On this page, you will gain more insights into the routes between airports. Explore the busiest routes, find the routes with the most delayed arrivals along with the average delay caused by each delay type, and see the busiest routes on a map.")
+
+# getting the precomputed aggregates of the flight data which are built once and shared by all the pages, every chart below is answered from the
+# route table in these (which already has the flights of every route, airline and month counted).
+cube = data.load_cube("data/flights_sample_3m.csv")
+months = cube.values('Month')
+month_names = data.month_names(months)
+profile.mark('load')
+
+
+st.header("Filter Flight Data by Month and Airline")
+selected_month = st.selectbox("Select a Month", ['All', *month_names.values()])
+selected_airline = st.selectbox("Select Airline", ['All Airlines', *cube.values('AIRLINE')])
+st.markdown("<b>*Note: </b> This selection will be used to filter all the charts below.",unsafe_allow_html=True)
+
+# setting the filter used for each chart, where all months or all airlines means there is no filter on them.
+selection = {}
+if selected_month != 'All':
+    selection['Month'] = months[list(month_names.values()).index(selected_month)]
+if selected_airline != 'All Airlines':
+    selection['AIRLINE'] = selected_airline
+
+
+def summarize(cube, selection):
+    # summing the route table up to one row per route for the selection (a lookup in the precomputed table rather than a pass over the flights).
+    return routes.summary(cube.query(routes.MEASURES, by=routes.ROUTE, **selection))
+
+
+route_summary = summarize(cube, selection)
+profile.mark('routes: query')
+
+
+
+# BUSIEST ROUTES
+st.subheader("Top 10 Busiest Routes")
+st.write("The bar chart below shows the 10 routes with the most flights for the selected month and airline.")
+
+
+# each chart is built by a function of the data and the widgets it depends on, and is only rebuilt when one of them changes (otherwise the
+# finished figure is reused from the figure cache).
+@figures.chart('Routes: busiest routes')
+def busiest_routes_chart(cube, selection):
+    busiest = routes.top(summarize(cube, selection), 10, 'RouteFlights').iloc[::-1]
+
+    # plotting a horizontal bar chart with the busiest route at the top and adding a tooltip.
+    fig1 = px.bar(busiest, y='Route', x='RouteFlights', orientation='h',
+                  labels={'Route': 'Route', 'RouteFlights': 'Number of Flights'},
+                  title='Top 10 Busiest Routes')
+    fig1.update_traces(hovertemplate='<b>Route:</b> %{y}<br><b>Number of Flights:</b> %{x:,.0f}<extra></extra>', marker_color='#048092')
+    return fig1
+
+
+fig1 = busiest_routes_chart(cube, selection)
+profile.mark('busiest routes: figure')
+st.plotly_chart(fig1)
+profile.mark('busiest routes: render')
+
+
+
+# MOST DELAYED ROUTES
+st.subheader("Top 10 Most Delayed Routes")
+st.write("The bar chart below shows the 10 routes with the highest percent of flights that arrived late, out of the routes with at least the chosen number of flights. The table under it shows the average delay (in minutes) caused by each delay type on those routes.")
+
+# leaving out routes with only a few flights, since a route with one late flight out of one would otherwise be the most delayed.
+most_flights = max(int(route_summary['RouteFlights'].max()) if len(route_summary) else 0, 2)
+min_flights = st.slider("Minimum Number of Flights on a Route", 1, most_flights, min(50, most_flights))
+
+
+@figures.chart('Routes: most delayed routes')
+def most_delayed_routes_chart(cube, selection, min_flights):
+    most_delayed = routes.top(summarize(cube, selection), 10, 'DelayRate', min_flights)
+
+    # plotting a horizontal bar chart with the most delayed route at the top and adding a tooltip.
+    fig2 = px.bar(most_delayed.iloc[::-1], y='Route', x='DelayRate', orientation='h',
+                  labels={'Route': 'Route', 'DelayRate': 'Delayed Flights'},
+                  title='Top 10 Routes by Percent of Delayed Flights', custom_data=['RouteFlights'])
+    fig2.update_xaxes(tickformat='.0%')
+    fig2.update_traces(hovertemplate='<b>Route:</b> %{y}<br><b>Delayed Flights:</b> %{x:.1%}<br><b>Number of Flights:</b> %{customdata[0]:,.0f}<extra></extra>',
+                       marker_color='#FF8700')
+    return fig2
+
+
+fig2 = most_delayed_routes_chart(cube, selection, min_flights)
+profile.mark('most delayed routes: figure')
+st.plotly_chart(fig2)
+
+# showing the average delay of each delay type on the most delayed routes.
+most_delayed = routes.top(route_summary, 10, 'DelayRate', min_flights).set_index('Route')
+delay_columns = [f'Average {cause}' for cause in data.DELAY_TYPES.values()]
+delay_table = most_delayed[['RouteFlights', *delay_columns]].rename(columns={'RouteFlights': 'Flights'})
+delay_table.insert(1, 'Delayed (%)', most_delayed['DelayRate'] * 100)
+st.dataframe(delay_table, column_config={column: st.column_config.NumberColumn(format='%.1f') for column in ['Delayed (%)', *delay_columns]})
+profile.mark('most delayed routes: render')
+
+
+
+# ROUTE MAP
+st.subheader("Map of the Busiest Routes")
+st.write("The map below shows the busiest routes for the selected month and airline, where thicker lines are routes with more flights.")
+
+# only drawing the busiest routes so that the map stays quick to draw and to move around in.
+map_routes = st.select_slider("Number of Routes on the Map", [10, 25, 50, 100, 200], 50)
+
+
+@figures.chart('Routes: route map')
+def route_map_chart(cube, selection, map_routes):
+    busiest = routes.top(summarize(cube, selection), map_routes, 'RouteFlights')
+    locations = routes.coordinates(set(busiest['ORIGIN']) | set(busiest['DEST']))
+    if locations is None:
+        return None
+    busiest = busiest[busiest['ORIGIN'].isin(locations.keys()) & busiest['DEST'].isin(locations.keys())]
+
+    # drawing every route as a line in a handful of traces (grouped by how busy they are) instead of a trace per route, with gaps (None) between the lines.
+    fig3 = go.Figure()
+    colors = px.colors.sequential.Teal[-4:]
+    bins = min(4, len(busiest))
+    for i in range(bins):
+        group = busiest.iloc[i * len(busiest) // bins:(i + 1) * len(busiest) // bins]
+        lats, lons = [], []
+        for origin, dest in zip(group['ORIGIN'], group['DEST']):
+            lats += [locations[origin][0], locations[dest][0], None]
+            lons += [locations[origin][1], locations[dest][1], None]
+        fig3.add_trace(go.Scattergeo(lat=lats, lon=lons, mode='lines', line=dict(width=4 - i, color=colors[-1 - i]),
+                                     hoverinfo='skip', showlegend=False))
+
+    # marking the airports on the routes and adding a tooltip with their flights.
+    flights = busiest.groupby('ORIGIN')['RouteFlights'].sum().add(busiest.groupby('DEST')['RouteFlights'].sum(), fill_value=0)
+    fig3.add_trace(go.Scattergeo(lat=[locations[code][0] for code in flights.index], lon=[locations[code][1] for code in flights.index],
+                                 text=flights.index, customdata=flights.values, mode='markers', marker=dict(size=6, color='#0068C9'),
+                                 hovertemplate='<b>Airport:</b> %{text}<br><b>Flights on These Routes:</b> %{customdata:,.0f}<extra></extra>',
+                                 showlegend=False))
+    fig3.update_layout(title_text=f'Top {len(busiest)} Busiest Routes', geo=dict(scope='usa'), margin=dict(t=50, l=0, r=0, b=0))
+    return fig3
+
+
+fig3 = route_map_chart(cube, selection, map_routes)
+profile.mark('route map: figure')
+if fig3 is None:
+    st.write("*The map needs the airportsdata package for the locations of the airports (`pip install airportsdata`).*")
+else:
+    st.plotly_chart(fig3, use_container_width=True)
+profile.mark('route map: render')
+
+
+
+profile.finish()
@@ -0,0 +1,138 @@
+import datetime
+import streamlit as st
+import plotly.express as px
+import base64
+import numpy as np
+import pandas as pd
+from flights import data, figures, profiling, risk
+
+st.set_page_config(
+    page_title="Delay Risk",
+    page_icon='✈️'
+    )
+
+# timing each section of the page when profiling is turned on (with ?profile=1 in the url or FLIGHTS_PROFILE=1).
+profile = profiling.start('Delay Risk')
+
+# reading the gif file as binary data and then encoding it as a base64, and storing the result as a string.
+with open("data/take-off.gif", "rb") as f:
+    gif_data = f.read()
+gif = base64.b64encode(gif_data).decode()
+
+# creating a centrerd layout with the gif and tile being in the same line and there being 10 pixels of space between the gif and title.
+st.markdown(
+    f"""
+    <div style="display: flex; justify-content: center; align-items: center;">
+        <img src="data:image/gif;base64,{gif}" alt="gif" width="100">
+        <h1 style="margin-left: 10px;"> Delay Risk</h1>
+    </div>
+    """,
+    unsafe_allow_html=True
+)
+# making a gray horizontal line under my title for a visual division.
+st.markdown("<hr style='border: 1px solid #f0f0f0;'>", unsafe_allow_html=True)
+
+# getting the precomputed aggregates of the flight data which are built once and shared by all the pages, and the delay risk model built
+# from them (a table of the risk of every airline, airport, hour, day and month).
+cube = data.load_cube("data/flights_sample_3m.csv")
+model = data.load_risk("data/flights_sample_3m.csv")
+profile.mark('load')
+
+st.write(f"On this page, you can estimate the risk of a planned flight arriving late or being cancelled, based on how the flights with the same airline, airports, departure hour, day of the week and month did from {data.period(cube.values('Month'))}.")
+
+# the names of the columns a flight is scored by.
+FACTOR_NAMES = {'AIRLINE': 'Airline', 'ORIGIN': 'Departure Airport', 'DEST': 'Arrival Airport', 'DepHour': 'Departure Hour',
+                'DayOfWeek': 'Day of the Week', 'Month': 'Month'}
+
+
+st.header("Enter a Planned Flight")
+selected_airline = st.selectbox('Select Airline', cube.values('AIRLINE'))
+selected_origin = st.selectbox('Select Departure Airport', cube.values('ORIGIN'))
+selected_dest = st.selectbox('Select Arrival Airport', cube.values('DEST'))
+selected_date = st.date_input('Select the Date of the Flight', datetime.date.today())
+selected_time = st.time_input('Select the Scheduled Departure Time', datetime.time(9, 0))
+
+# the planned flight as a row of a schedule with the same columns as the csv.
+flight = pd.DataFrame({'FL_DATE': [selected_date], 'AIRLINE': [selected_airline], 'ORIGIN': [selected_origin], 'DEST': [selected_dest],
+                       'CRS_DEP_TIME': [selected_time.hour * 100 + selected_time.minute]})
+scores = model.score(flight).iloc[0]
+profile.mark('score')
+
+
+
+# THE RISK OF THE FLIGHT
+st.subheader(f'Delay Risk of {selected_airline} from {selected_origin} to {selected_dest}')
+st.write("The numbers below show the chance of the flight arriving late or being cancelled, and the average arrival delay (in minutes, where a negative delay is an early arrival) of flights like it, compared to the average flight.")
+
+col1, col2, col3 = st.columns(3)
+col1.metric('Chance of Arriving Late', f"{scores['DelayProbability']:.1%}",
+            f"{(scores['DelayProbability'] - model.base['delayed']) * 100:+.1f} points", delta_color='inverse')
+col2.metric('Chance of Being Cancelled', f"{scores['CancelProbability']:.1%}",
+            f"{(scores['CancelProbability'] - model.base['cancelled']) * 100:+.1f} points", delta_color='inverse')
+col3.metric('Expected Arrival Delay', f"{scores['ExpectedDelay']:.1f} min",
+            f"{scores['ExpectedDelay'] - model.base['minutes']:+.1f} min", delta_color='inverse')
+
+
+
+# WHAT THE RISK COMES FROM
+st.subheader("What the Risk Comes From")
+st.write("The bar chart below shows how much each part of the planned flight changes its chance of arriving late, compared to the average flight. Red bars make a delay more likely and blue bars less likely.")
+
+
+# the chart is built by a function of the model and the planned flight, and is only rebuilt when one of them changes (otherwise the
+# finished figure is reused from the figure cache).
+@figures.chart('Delay Risk: factors')
+def factors_chart(model, selected_airline, selected_origin, selected_dest, selected_date, selected_time):
+    flight = pd.DataFrame({'FL_DATE': [selected_date], 'AIRLINE': [selected_airline], 'ORIGIN': [selected_origin], 'DEST': [selected_dest],
+                           'CRS_DEP_TIME': [selected_time.hour * 100 + selected_time.minute]})
+    contributions = model.contributions(flight)['delayed']
+
+    # the chance of a delay with only one part of the flight known, less the chance for the average flight.
+    base = risk.logit(model.base['delayed'])
+    changes = pd.Series({FACTOR_NAMES[factor]: (1 / (1 + np.exp(-(base + change[0]))) - model.base['delayed']) * 100
+                         for factor, change in contributions.items()})
+
+    # plotting a horizontal bar chart with a bar for each part of the flight and adding a tooltip.
+    fig1 = px.bar(x=changes.values, y=changes.index, orientation='h',
+                  labels={'x': 'Change in the Chance of Arriving Late (points)', 'y': ''},
+                  title='Change in the Chance of Arriving Late by Each Part of the Flight')
+    fig1.update_traces(hovertemplate='<b>%{y}:</b> %{x:+.2f} points<extra></extra>',
+                       marker_color=['#FF2B2B' if change > 0 else '#0068C9' for change in changes.values])
+    return fig1
+
+
+fig1 = factors_chart(model, selected_airline, selected_origin, selected_dest, selected_date, selected_time)
+profile.mark('factors: figure')
+st.plotly_chart(fig1)
+profile.mark('factors: render')
+
+
+
+# SCORING A SCHEDULE
+st.subheader("Score a Whole Schedule")
+st.write("Upload a csv of planned flights with the FL_DATE, AIRLINE, ORIGIN, DEST and CRS_DEP_TIME columns (in the same format as the flight data) to score all of them at once. The same can be done from the command line with `python -m flights.risk schedule.csv --output scores.csv`.")
+
+uploaded = st.file_uploader("Upload a Schedule", type='csv')
+scored = None
+if uploaded is not None:
+    # the flights without a valid date or departure time are kept in the scores, but left empty.
+    try:
+        schedule, scorable = risk.read_schedule(uploaded)
+        scored = pd.concat([schedule, model.score(schedule[scorable])], axis=1)
+    except (ValueError, KeyError) as error:
+        st.error(f"The schedule couldn't be scored: {error}. It needs the {', '.join(risk.SCHEDULE_COLUMNS)} columns, in the same format as the flight data.")
+    profile.mark('schedule: score')
+if scored is not None:
+    st.write(f"Scored {scorable.sum():,} flights, the riskiest of which are shown below.")
+    if not scorable.all():
+        st.warning(f"{(~scorable).sum():,} flights without a valid FL_DATE or CRS_DEP_TIME couldn't be scored, and have empty scores in the download.")
+    st.dataframe(scored.nlargest(100, 'DelayProbability'), hide_index=True,
+                 column_config={'DelayProbability': st.column_config.NumberColumn('Chance of Arriving Late', format='%.3f'),
+                                'CancelProbability': st.column_config.NumberColumn('Chance of Being Cancelled', format='%.3f'),
+                                'ExpectedDelay': st.column_config.NumberColumn('Expected Arrival Delay', format='%.1f')})
+    st.download_button("Download the Scores", scored.to_csv(index=False), file_name='scores.csv', mime='text/csv')
+    profile.mark('schedule: render')
+
+
+
+profile.finish()